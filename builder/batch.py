@@ -0,0 +1,277 @@
+#!/usr/bin/env python
+"""
+Generates manors in bulk, for testing content and for seeding games.
+
+Each manor is generated from its own seed by a pool of worker processes,
+and written to a file as a single line of JSON as soon as it's finished,
+in the order they finish. A line contains the layout (rooms and
+corridors), the feature grid (as glyphs, plus a list of the furniture,
+doors and so on by name) and the room properties.
+
+Usage::
+
+  python generate.py --count 100 --type H --output manors.jsonl
+
+See ``python generate.py --help`` for the other options.
+"""
+
+import json, multiprocessing, optparse, os, random, sys, time
+import builder, manor
+import database.database as db
+from library.coord import *
+from interface.features import *
+from suspects import person
+
+# The phases of generating a manor, in order.
+PHASES = ("layout", "features", "rooms", "export")
+
+# Names for the directions the windows of a room face.
+DIRECTION_NAMES = {DIR_NORTH: "north", DIR_SOUTH: "south",
+                   DIR_EAST: "east", DIR_WEST: "west"}
+
+# The contents of the databases before the first manor was generated.
+_db_contents = None
+
+def reset_databases ():
+    """
+    Restores the contents of all databases to their state before the
+    first manor was generated in this process. Room types and names are
+    removed from the databases as they are used, so without this a
+    manor would depend on the ones generated before it.
+    """
+    global _db_contents
+    if _db_contents == None:
+        _db_contents = [(d, d[:]) for d in db.get_databases()]
+    for d, contents in _db_contents:
+        d[:] = contents
+
+def task_seed (seed, attempt):
+    """
+    Returns the seed for a given attempt at generating a manor. The first
+    attempt uses the task's seed itself.
+
+    :``seed``: The seed of the task. *Required*.
+    :``attempt``: The number of the attempt, starting at 0. *Required*.
+    """
+    if attempt == 0:
+        return seed
+    return (seed * 1000003 + attempt) & 0x7fffffff
+
+def export_manor (m):
+    """
+    Returns a dictionary describing a finished manor, that can be written
+    out as JSON.
+
+    :``m``: A ManorCollection with features and room names. *Required*.
+    """
+    size  = m.features.size()
+    rows  = []
+    feats = []
+    for y in xrange(size.y):
+        row = []
+        for x in xrange(size.x):
+            feat = m.features[Coord(x, y)]
+            row.append(feat.glyph())
+            if feat != NOTHING and feat != WALL and feat != FLOOR:
+                feats.append([x, y, feat.name()])
+        rows.append(''.join(row))
+
+    def rect (idx):
+        return {"id": idx, "pos": [m[idx].pos().x, m[idx].pos().y],
+                "size": [m[idx].size().x, m[idx].size().y]}
+
+    rooms = []
+    for r in m.get_room_corridors():
+        rp = m.room_props[r]
+        rooms.append({"id": r, "name": rp.name, "section": rp.section,
+                      "corridor": rp.is_a_corridor(),
+                      "adjoining": rp.adj_rooms[:],
+                      "windows": [DIRECTION_NAMES[d] for d in rp.windows],
+                      "owners": rp.owners[:],
+                      "furniture": rp.furniture[:],
+                      "description": rp.description})
+
+    return {"size": [size.x, size.y],
+            "rooms": [rect(r) for r in m.rooms],
+            "corridors": [rect(c) for c in m.corridors],
+            "main_corridor": m.main_corridor,
+            "entrance_hall": m.entrance_hall,
+            "map": rows,
+            "features": feats,
+            "room_props": rooms}
+
+def build_manor (type, min_rooms, suspects):
+    """
+    Generates a single manor with the current random state, and returns
+    it in the format of ``export_manor``, along with the time taken by
+    each phase.
+
+    :``type``: The layout type, as for ``builder.builder_by_type``. *Required*.
+    :``min_rooms``: The minimum number of rooms. *Required*.
+    :``suspects``: The number of suspects that need a bedroom. *Required*.
+    """
+    timing = {}
+    start  = time.time()
+    m = manor.ManorCollection(builder.builder_by_type(type, min_rooms=min_rooms))
+    timing["layout"] = time.time() - start
+
+    start = time.time()
+    m.add_features()
+    timing["features"] = time.time() - start
+
+    start = time.time()
+    owner_list = None
+    if suspects > 0:
+        owner_list = person.SuspectList(suspects).get_id_name_tuples()
+    m.init_room_names(owner_list)
+    timing["rooms"] = time.time() - start
+
+    start = time.time()
+    data  = export_manor(m)
+    timing["export"] = time.time() - start
+    return data, timing
+
+def generate_manor (task):
+    """
+    Generates a manor for a task, retrying with a different seed if the
+    generation fails. Runs in a worker process.
+
+    Returns a dictionary with the task's ``index`` and the ``seed`` used,
+    the number of ``retries`` needed, the per-phase ``timing`` of the
+    successful attempt, and either the ``manor`` or, if all attempts
+    failed, the last ``error``.
+
+    :``task``: A tuple of (index, seed, type, min_rooms, suspects, retries).
+               *Required*.
+    """
+    index, seed, type, min_rooms, suspects, retries = task
+    timing = dict.fromkeys(PHASES, 0.0)
+    error  = None
+    for attempt in xrange(retries + 1):
+        curr_seed = task_seed(seed, attempt)
+        random.seed(curr_seed)
+        reset_databases()
+        try:
+            data, phases = build_manor(type, min_rooms, suspects)
+        except Exception, e:
+            error = "%s: %s" % (e.__class__.__name__, e)
+            continue
+        for p in phases:
+            timing[p] += phases[p]
+        return {"index": index, "seed": curr_seed, "retries": attempt,
+                "timing": timing, "manor": data}
+
+    return {"index": index, "seed": seed, "retries": retries,
+            "timing": timing, "error": error}
+
+def init_worker (verbose):
+    """
+    Sets up a worker process. The builders are quite talkative, so their
+    output is discarded unless ``verbose`` is set.
+
+    :``verbose``: If true, keep the debugging output. *Required*.
+    """
+    if not verbose:
+        sys.stdout = open(os.devnull, "w")
+
+def run_batch (output, count, type=None, min_rooms=0, suspects=0, seed=None,
+               jobs=None, retries=3, verbose=False, report=sys.stderr):
+    """
+    Generates a number of manors in parallel, writing each one to
+    ``output`` as a line of JSON as soon as it's done, and prints a
+    summary of the timing and failures to ``report``. Returns the number
+    of manors that couldn't be generated.
+
+    :``output``: A file-like object. *Required*.
+    :``count``: The number of manors. *Required*.
+    :``type``: The layout type, as for ``builder.builder_by_type``. *Default random*.
+    :``min_rooms``: The minimum number of rooms. *Default 0*.
+    :``suspects``: The number of suspects that need a bedroom. *Default 0*.
+    :``seed``: The base seed; manor *n* uses ``seed + n``. *Default random*.
+    :``jobs``: The number of worker processes. *Default: one per CPU*.
+    :``retries``: How often to retry a failed manor with another seed. *Default 3*.
+    :``verbose``: If true, keep the debugging output of the builders. *Default False*.
+    :``report``: A file-like object for the summary. *Default stderr*.
+    """
+    if seed == None:
+        seed = random.randint(0, 0x7fffffff - count)
+    if jobs == None:
+        jobs = multiprocessing.cpu_count()
+
+    tasks = [(i, seed + i, type, min_rooms, suspects, retries) for i in xrange(count)]
+    totals   = dict.fromkeys(PHASES, 0.0)
+    done     = 0
+    failures = 0
+    retried  = 0
+    start    = time.time()
+
+    pool = multiprocessing.Pool(jobs, init_worker, (verbose,))
+    try:
+        for result in pool.imap_unordered(generate_manor, tasks):
+            for p in PHASES:
+                totals[p] += result["timing"][p]
+            retried += result["retries"]
+            if "error" in result:
+                failures += 1
+                print >> report, "manor %s (seed %s) failed: %s" % (result["index"], result["seed"], result["error"])
+                continue
+            done += 1
+            output.write(json.dumps(result))
+            output.write("\n")
+            output.flush()
+        pool.close()
+    except:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+
+    elapsed = time.time() - start
+    print >> report, "%s of %s manors generated in %.2fs with %s processes (%.1f per second)" % (done, count, elapsed, jobs, done / max(elapsed, 0.001))
+    print >> report, "failures: %s, retries: %s, base seed: %s" % (failures, retried, seed)
+    for p in PHASES:
+        print >> report, "  %-8s %8.2fs total, %6.3fs per manor" % (p, totals[p], totals[p] / max(count, 1))
+    return failures
+
+def main (args=None):
+    parser = optparse.OptionParser(usage="%prog [options]", description="Generates manors in parallel and writes them to a file as JSON, one per line.")
+    parser.add_option("-n", "--count", type="int", default=10,
+                      help="number of manors to generate [default: %default]")
+    parser.add_option("-t", "--type", default=None,
+                      help="layout type: B, L, U or H [default: random]")
+    parser.add_option("-r", "--min-rooms", type="int", default=0, dest="min_rooms",
+                      help="minimum number of rooms [default: %default]")
+    parser.add_option("-p", "--suspects", type="int", default=0,
+                      help="number of suspects needing a bedroom [default: %default]")
+    parser.add_option("-s", "--seed", type="int", default=None,
+                      help="base seed; manor n uses seed+n [default: random]")
+    parser.add_option("-j", "--jobs", type="int", default=None,
+                      help="number of worker processes [default: one per CPU]")
+    parser.add_option("--retries", type="int", default=3,
+                      help="retries with a new seed per failed manor [default: %default]")
+    parser.add_option("-o", "--output", default="manors.jsonl",
+                      help="output file, or - for stdout [default: %default]")
+    parser.add_option("-v", "--verbose", action="store_true", default=False,
+                      help="keep the debugging output of the builders")
+    options, rest = parser.parse_args(args)
+
+    type = options.type
+    if type != None:
+        type = type.upper()
+
+    if options.output == "-":
+        output = sys.stdout
+    else:
+        output = open(options.output, "w")
+    try:
+        failures = run_batch(output, options.count, type, options.min_rooms,
+                             options.suspects, options.seed, options.jobs,
+                             options.retries, options.verbose)
+    finally:
+        if output != sys.stdout:
+            output.close()
+    return failures == 0
+
+if __name__ == "__main__":
+    if not main():
+        sys.exit(1)
@@ -19,6 +19,7 @@ Attempt to create a "manor" akin to::
 
 """
 import random, copy, room
+from contextlib import contextmanager
 from library import shape, collection
 from library.coord import *
 from library.random_util import *
@@ -34,10 +35,25 @@ O_LAYOUT = "O-corridors"
 U_LAYOUT = "U-corridors"
 
 class BuilderCollection (collection.ShapeCollection):
+    """
+    A ShapeCollection that keeps track of which of its members are rooms and
+    which are corridors.
+
+    The index is rebuilt after every method that changes the collection;
+    ``append`` and ``extend`` only index the new members. To make several
+    changes in a row and only rebuild once, use a batch::
+
+      with base.batch():
+          base.place_on(leg)
+          base.append(corridor, offset)
+
+    While a batch is open, ``rooms`` and ``corridors`` are not updated.
+    """
     corridors = None
     rooms     = None
     legs      = None
     main_corridor = None
+    _batch_depth  = 0
 
     def __init__ (self, c=[]):
         if c != [] and isinstance(c, BuilderCollection):
@@ -56,14 +72,52 @@ class BuilderCollection (collection.ShapeCollection):
         self.rooms = []
         if not self.legs:
             self.legs = []
-        for index, sh in enumerate(self):
-            if isinstance(sh.shape, MainCorridor):
-                self.main_corridor = index
+        for index in xrange(len(self)):
+            self._index_member(index)
+
+    def _index_member (self, index):
+        """
+        Add the member at ``index`` to the list of rooms or corridors.
+
+        :``index``: The index of the member. *Required*.
+        """
+        sh = self[index]
+        if isinstance(sh.shape, MainCorridor):
+            self.main_corridor = index
+
+        if isinstance(sh.shape, Corridor):
+            self.corridors.append(index)
+        else:
+            self.rooms.append(index)
+
+    def begin_batch (self):
+        """
+        Stop rebuilding the index after each change, until ``end_batch`` is
+        called. Batches can be nested.
+        """
+        self._batch_depth += 1
+
+    def end_batch (self):
+        """
+        Close a batch opened by ``begin_batch``. When the outermost batch is
+        closed, the index is rebuilt.
+        """
+        assert self._batch_depth > 0
+        self._batch_depth -= 1
+        if self._batch_depth == 0:
+            self.rebuild()
 
-            if isinstance(sh.shape, Corridor):
-                self.corridors.append(index)
-            else:
-                self.rooms.append(index)
+    @contextmanager
+    def batch (self):
+        """
+        A context manager that opens a batch for the duration of a ``with``
+        block. See ``begin_batch``.
+        """
+        self.begin_batch()
+        try:
+            yield self
+        finally:
+            self.end_batch()
 
     def corridor (self, index):
         assert index in self.corridors
@@ -98,24 +152,52 @@ class BuilderCollection (collection.ShapeCollection):
         return None
 
     def _rebuild_wrap (function):
+        # The function runs as a batch, so that the methods it calls in
+        # turn (such as ``pop`` and ``insert`` for ``prioritise``) don't
+        # rebuild the index as well.
         def wrapper (self, *args, **kwargs):
-            function(self, *args, **kwargs)
-            self.rebuild()
+            self.begin_batch()
+            try:
+                return function(self, *args, **kwargs)
+            finally:
+                self.end_batch()
         wrapper.__name__ = function.__name__
         wrapper.__doc__ = function.__doc__ + "\n\nCalling this function automatically rebuilds the BuilderCollection index."
         return wrapper
 
-    __setitem__ = _rebuild_wrap(collection.ShapeCollection.__setitem__)
-    append      = _rebuild_wrap(collection.ShapeCollection.append)
-    extend      = _rebuild_wrap(collection.ShapeCollection.extend)
+    def _append_wrap (function):
+        # Members are only ever added to the end, so only they need to be
+        # indexed.
+        def wrapper (self, *args, **kwargs):
+            start  = len(self)
+            result = function(self, *args, **kwargs)
+            if self._batch_depth == 0:
+                for index in xrange(start, len(self)):
+                    self._index_member(index)
+            return result
+        wrapper.__name__ = function.__name__
+        wrapper.__doc__ = function.__doc__ + "\n\nCalling this function automatically adds the new members to the BuilderCollection index."
+        return wrapper
+
+    _set_member = _rebuild_wrap(collection.ShapeCollection.__setitem__)
+
+    def __setitem__ (self, item, value):
+        """
+        See ``ShapeCollection::__setitem__``. Replacing a member by index
+        rebuilds the BuilderCollection index; setting glyphs doesn't.
+        """
+        if isinstance(item, int):
+            return self._set_member(item, value)
+        return collection.ShapeCollection.__setitem__(self, item, value)
+
+    append      = _append_wrap(collection.ShapeCollection.append)
+    extend      = _append_wrap(collection.ShapeCollection.extend)
     insert      = _rebuild_wrap(collection.ShapeCollection.insert)
     pop         = _rebuild_wrap(collection.ShapeCollection.pop)
     prioritise  = _rebuild_wrap(collection.ShapeCollection.prioritise)
     reverse     = _rebuild_wrap(collection.ShapeCollection.reverse)
     reversed    = _rebuild_wrap(collection.ShapeCollection.reversed)
     sort        = _rebuild_wrap(collection.ShapeCollection.sort)
-    append      = _rebuild_wrap(collection.ShapeCollection.append)
-    prioritise  = _rebuild_wrap(collection.ShapeCollection.prioritise)
 
 class Corridor (shape.Shape):
     pass
@@ -412,8 +494,7 @@ def attach_leg (base, leg, side=SIDE_LEFT, placement=PLACE_TOP, corr_offset = No
     assert corridor is not None
 
     # Find the corridor's end point
-    stop   = coord.Coord(start)
-    stop.x = corridor.width()
+    stop   = coord.Coord(corridor.width(), start.y)
 
     if side == SIDE_RIGHT:
         offs = leg[0].width() - start.x
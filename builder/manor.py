@@ -20,6 +20,7 @@ Attempt to create a "manor" akin to::
 """
 
 import random, builder, room
+from array import array
 from interface.features import *
 from library.coord import *
 from library.random_util import *
@@ -27,9 +28,101 @@ from library.feature import *
 from library import pathfind
 
 class ManorCollection (builder.BuilderCollection):
+    distance_fields = None
+    field_mask      = None
+    connectivity    = None
+    planner         = None
+    neighbours      = None
+    room_labels     = None
+    corridor_labels = None
+    label_size      = None
+    room_graph      = None
+    room_cells      = None
+    room_features   = None
+    room_index_version = None
+
     def __init__ (self, c=[]):
         builder.BuilderCollection.__init__(self, c)
 
+    def _index_member (self, index):
+        # The layout has changed, so the labels have to be redone.
+        self.room_labels = self.corridor_labels = None
+        self.room_graph  = None
+        self.room_index_version = None
+        builder.BuilderCollection._index_member(self, index)
+
+    def _label_members (self, idx_list, width, height):
+        """
+        Returns a flat array, indexed by ``y*width+x``, of the first member
+        out of ``idx_list`` covering each position, or -1, along with a
+        dictionary mapping the positions covered by several members to
+        the list of all of them.
+
+        :``idx_list``: A list of room or corridor indices. *Required*.
+        :``width``: The width of the manor. *Required*.
+        :``height``: The height of the manor. *Required*.
+        """
+        labels   = array('i', [-1]) * (width * height)
+        overflow = {}
+        for r in idx_list:
+            curr  = self[r]
+            start = curr.pos()
+            stop  = start + curr.size()
+            left  = max(0, start.x)
+            right = min(stop.x, width)
+            if left >= right:
+                continue
+            for y in xrange(max(0, start.y), min(stop.y, height)):
+                a = y * width + left
+                b = y * width + right
+                if labels[a:b].count(-1) == b - a:
+                    labels[a:b] = array('i', [r]) * (b - a)
+                    continue
+                # Shared walls.
+                for idx in xrange(a, b):
+                    if labels[idx] == -1:
+                        labels[idx] = r
+                    elif idx in overflow:
+                        overflow[idx].append(r)
+                    else:
+                        overflow[idx] = [labels[idx], r]
+        return labels, overflow
+
+    def init_labels (self):
+        """
+        Rasterises the rooms and corridors into per-position labels, so
+        that ``get_room_index``, ``get_corridor_index`` and related methods
+        don't need to check each room in turn. This is done automatically
+        by the first lookup after the layout has changed.
+        """
+        size = self.size()
+        self.label_size      = size
+        self.room_labels     = self._label_members(self.rooms, size.x, size.y)
+        self.corridor_labels = self._label_members(self.corridors, size.x, size.y)
+
+    def _get_label (self, pos, labels, single):
+        """
+        Looks up ``pos`` in either ``room_labels`` or ``corridor_labels``.
+        See ``get_room_index``.
+        """
+        size = self.label_size
+        if pos.x < 0 or pos.y < 0 or pos.x >= size.x or pos.y >= size.y:
+            if single:
+                return None
+            return []
+        labels, overflow = labels
+        idx = pos.y * size.x + pos.x
+        r   = labels[idx]
+        if single:
+            if r == -1:
+                return None
+            return r
+        if idx in overflow:
+            return overflow[idx][:]
+        if r == -1:
+            return []
+        return [r]
+
     def print_corridors (self):
         """
         Debugging method. Iterates over all corridors and prints the location
@@ -48,19 +141,9 @@ class ManorCollection (builder.BuilderCollection):
         :``single``: If true, returns the first index encountered.
                      Otherwise, a list containing all matching indices. *Default true*.
         """
-        list = []
-        for idx in self.corridors:
-            corr = self.corridor(idx)
-            c = corr.pos()
-            r = corr.size() - 1
-            if (pos.x >= c.x and pos.x <= c.x + r.x
-                and pos.y >= c.y and pos.y <= c.y + r.y):
-                if single:
-                    return idx
-                list.append(idx)
-        if single:
-            return None
-        return list
+        if self.corridor_labels == None:
+            self.init_labels()
+        return self._get_label(pos, self.corridor_labels, single)
 
     def get_corridor_indices (self, pos):
         """
@@ -89,19 +172,9 @@ class ManorCollection (builder.BuilderCollection):
         :``single``: If true, returns the first index encountered.
                      Otherwise, a list containing all matching indices. *Default true*.
         """
-        list = []
-        for idx in self.rooms:
-            curr = self.get_room(idx)
-            start = curr.pos()
-            end   = start + curr.size() - 1
-            if (pos.x >= start.x and pos.x <= end.x
-                and pos.y >= start.y and pos.y <= end.y):
-                if single:
-                    return idx
-                list.append(idx)
-        if single:
-            return None
-        return list
+        if self.room_labels == None:
+            self.init_labels()
+        return self._get_label(pos, self.room_labels, single)
 
     def get_room_indices (self, pos):
         """
@@ -242,75 +315,98 @@ class ManorCollection (builder.BuilderCollection):
         defined by the rooms/corridor layout.
         """
         self.init_room_properties()
-        self.features = FeatureGrid(self.size().x, self.size().y)
+        self.room_graph = None
+        self.features   = FeatureGrid(self.size().x, self.size().y)
+        self.neighbours = coord.get_neighbour_table(self.features.size())
 
         print "Manor size: %s" % self.size()
         print "Feature size: %s" % self.features.size()
 
-        # Iterate over all rooms and corridors, and mark positions within
+        # Draw all rooms and corridors in order, marking positions within
         # them as floor, and their boundaries as walls.
         for r in self.get_room_corridors():
-            is_corridor = False # The "room" is actually a corridor.
             if r in self.rooms:
-                curr = self.get_room(r)
+                self.draw_room_features(r)
             else:
-                is_corridor = True
-                curr = self.corridor(r)
-
-            start = curr.pos()
-            stop  = curr.pos() + curr.size()
-            # Note: Currently, only the main corridor is ever horizontal
-            # but that might change in the future.
-            horizontal = False # If a corridor, it's a horizontal one.
-
-            # Debugging output, and setting horizontal.
-            if is_corridor:
-                if curr.height() == 1:
-                    horizontal = True
-                    direction = "horizontal"
-                else:
-                    direction = "vertical"
-                # print "Corridor %s: start=%s, stop=%s (%s)" % (r, start, stop, direction)
-
-            # Iterate over all coordinates within the room.
-            for pos in coord.RectangleIterator(start, stop):
-                # If we've reached the manor boundary, this is a wall.
-                if (pos.x == 0 or pos.x == self.size().x -1
-                    or pos.y == 0 or pos.y == self.size().y - 1):
-                    self.set_feature(pos, WALL)
-                # Corridors overwrite walls previously set by rooms.
-                elif is_corridor:
-                    self.set_feature(pos, FLOOR)
-                    # print pos
-                    # Depending on the corridor orientation, mark the
-                    # adjacent non-corridor squares as walls.
-                    adjacent = []
-                    if horizontal:
-                        adjacent = (DIR_NORTH, DIR_SOUTH)
-                    else:
-                        adjacent = (DIR_WEST, DIR_EAST)
-                    for dir in adjacent:
-                        pos2 = pos + dir
-                        # self.set_feature(pos2, WALL)
-                        if pos2 <= 0 or pos2 >= self.size():
-                            continue
-                        corridx = self.get_corridor_indices(pos2)
-                        # print "pos2: %s -> corridors=%s" % (pos2, corridx),
-                        if r in corridx:
-                            corridx.remove(r)
-                            # print corridx
-                        # else:
-                            # print
-                        if len(corridx) == 0:
-                            self.set_feature(pos2, WALL)
-                # The room boundary is always a wall.
-                elif (pos.x == start.x or pos.x == stop.x - 1
-                    or pos.y == start.y or pos.y == stop.y - 1):
-                    self.set_feature(pos, WALL)
-                # Otherwise, we are inside the room.
-                # Mark as floor but don't overwrite previously placed walls.
-                elif self.get_feature(pos) != WALL:
-                    self.set_feature(pos, FLOOR)
+                self.draw_corridor_features(r)
+
+    def draw_room_features (self, r):
+        """
+        Marks the boundary of a room as walls, and its inside as floor,
+        without overwriting previously placed walls. Called by
+        ``init_features``.
+
+        :``r``: A room index. *Required*.
+        """
+        curr  = self.get_room(r)
+        start = curr.pos()
+        stop  = start + curr.size()
+        feats = self.features
+        feats.fill(start, Coord(stop.x, start.y + 1), WALL)
+        feats.fill(Coord(start.x, stop.y - 1), stop, WALL)
+        feats.fill(Coord(start.x, start.y + 1), Coord(start.x + 1, stop.y - 1), WALL)
+        feats.fill(Coord(stop.x - 1, start.y + 1), Coord(stop.x, stop.y - 1), WALL)
+        feats.fill(start + 1, stop - 1, FLOOR, keep=WALL)
+        self.draw_manor_boundary(start, stop)
+
+    def draw_corridor_features (self, r):
+        """
+        Marks a corridor as floor, and the positions along either side of it
+        as walls, unless they belong to another corridor. Called by
+        ``init_features``. Corridors are a single row or column wide.
+
+        :``r``: A corridor index. *Required*.
+        """
+        if self.corridor_labels == None:
+            self.init_labels()
+        covered = self.corridor_labels[0]
+        curr  = self.corridor(r)
+        start = curr.pos()
+        stop  = start + curr.size()
+        size  = self.features.size()
+        self.features.fill(start, stop, FLOOR)
+
+        # The sides of the corridor, excluding positions along the manor
+        # boundary, and those next to it.
+        if curr.height() == 1:
+            if start.y <= 0 or start.y >= size.y - 1:
+                first, last = 0, 0
+            else:
+                first, last = max(start.x, 1), min(stop.x, size.x - 1)
+            sides = [(x, y) for y in (start.y - 1, start.y + 1) if 0 < y < size.y
+                     for x in xrange(first, last)]
+        else:
+            if start.x <= 0 or start.x >= size.x - 1:
+                first, last = 0, 0
+            else:
+                first, last = max(start.y, 1), min(stop.y, size.y - 1)
+            sides = [(x, y) for y in xrange(first, last)
+                     for x in (start.x - 1, start.x + 1) if 0 < x < size.x]
+
+        for x, y in sides:
+            if covered[y * size.x + x] == -1:
+                self.features.__setitem__(Coord(x, y), WALL)
+        self.draw_manor_boundary(start, stop)
+
+    def draw_manor_boundary (self, start, stop):
+        """
+        Marks those positions of a rectangle that lie along the edge of the
+        manor as walls.
+
+        :``start``: The top left corner of the rectangle. *Required*.
+        :``stop``: The bottom right corner of the rectangle (exclusive).
+                   *Required*.
+        """
+        size  = self.features.size()
+        feats = self.features
+        if start.y <= 0:
+            feats.fill(start, Coord(stop.x, 1), WALL)
+        if stop.y >= size.y:
+            feats.fill(Coord(start.x, size.y - 1), stop, WALL)
+        if start.x <= 0:
+            feats.fill(start, Coord(1, stop.y), WALL)
+        if stop.x >= size.x:
+            feats.fill(Coord(size.x - 1, start.y), stop, WALL)
 
     def get_feature (self, pos):
         """
@@ -335,84 +431,105 @@ class ManorCollection (builder.BuilderCollection):
             print "Invalid coord %s in manor of size %s" % (pos, self.size())
             return NOTHING
 
-        return self.features.__setitem__(pos, feat)
+        changed   = (self.features.__getitem__(pos).traversable() != feat.traversable())
+        old_flags = self.features.flags(pos)
+        self.check_room_indices()
+        result  = self.features.__setitem__(pos, feat)
+        self.update_room_indices(pos, old_flags)
+        if changed:
+            if self.distance_fields != None:
+                self.invalidate_distance_fields()
+            if self.connectivity:
+                for index in self.connectivity.values():
+                    if pos in index:
+                        index.invalidate()
+
+        return result
+
+    def get_room_graph (self):
+        """
+        Returns the RoomGraph of the manor, creating it if necessary. It is
+        discarded whenever the layout or the feature grid is reset.
+        """
+        if self.room_graph == None:
+            self.room_graph = room.RoomGraph(self)
+        return self.room_graph
+
+    def connect_rooms (self, r1, r2, pos):
+        """
+        Records a door connecting two rooms or corridors, both in the room
+        graph and in the room properties.
+
+        :``r1``: A room or corridor index. *Required*.
+        :``r2``: Another room or corridor index. *Required*.
+        :``pos``: The position of the door. *Required*.
+        """
+        self.get_room_graph().add_door(r1, r2, pos)
+        self.room_props[r1].add_adjoining_room(r2)
+        self.room_props[r2].add_adjoining_room(r1)
 
-    def add_doors_along_corridor (self, start, stop, offset = DIR_NOWHERE):
+    def disconnect_rooms (self, r1, r2, pos):
         """
-        Walks along a corridor, and for each adjacent room picks a random
-        wall spot to turn into a door.
+        Forgets about a door between two rooms or corridors. Unless there
+        is another door between them, they no longer adjoin each other.
 
-        :``start``: The corridor's starting position. *Required*
-        :``stop``: The corridor's end position. *Required*.
-        :``offset``: A coordinate specifying how the door position needs to be shifted. *Default (0,0)*.
+        :``r1``: A room or corridor index. *Required*.
+        :``r2``: Another room or corridor index. *Required*.
+        :``pos``: The position of the door. *Required*.
         """
-        # print "add_doors_along_corridors(start=(%s), stop=(%s), offset=(%s))" % (start, stop, offset)
-        assert stop > start
+        graph = self.get_room_graph()
+        graph.remove_door(r1, r2, pos)
+        if r2 not in graph.neighbours(r1):
+            self.room_props[r1].adj_rooms.remove(r2)
+            self.room_props[r2].adj_rooms.remove(r1)
 
+    def add_doors_along_corridor (self, slots):
+        """
+        Walks along one side of a corridor, and for each adjacent room picks
+        a random wall spot to turn into a door.
+
+        :``slots``: The door spots along this side, as returned by
+                    ``RoomGraph.get_corridor_slots``. *Required*.
+        """
         candidates = [] # All valid door spots for the current room.
         old_room   = -1 # The index of the most recent room seen.
 
-        for p in coord.RectangleIterator(start, stop + 1):
-            pos = p + offset
-            if (pos.x < 2 or pos.x >= self.size().x - 1
-            or pos.y < 2 or pos.y >= self.size().y - 1):
-                continue
-
-            if self.get_feature(pos) != WALL:
+        # The slots all lie within the manor, so the feature grid can be
+        # accessed directly.
+        feats = self.features
+        for pos, curr_room, corr, is_candidate in slots:
+            if feats[pos] != WALL:
                 continue
 
             # If a room is adjacent to both the main and a leg corridor,
             # both of them may place doors. This is okay, but they should
             # not be adjacent to each other.
             has_adj_door = False
-            for adj in coord.AdjacencyIterator(pos):
-                if feature_is_door(self.get_feature(adj)):
+            for adj in self.neighbours.adjacent_coords(pos):
+                if feats.flags(adj) & FLAG_DOOR:
                     has_adj_door = True
             if has_adj_door:
                 continue
 
-            rooms = self.get_room_indices(pos)
-            corrs = self.get_corridor_indices(pos - offset)
-            # print "pos: (%s), rooms: %s, corrs: %s" % (pos, rooms, corrs)
-            # Make sure there's only exactly one room for this wall.
-            # There also may be no other corridor except this one.
-            if len(rooms) == 1 and len(corrs) == 1:
-                # print "(%s, %s) -> %s" % (pos.x, pos.y, rooms)
-                curr_room = rooms[0]
-                if old_room != curr_room:
-                    # We've reached another room. Time to pick a door spot for the old room.
-                    if len(candidates):
-                        rand_coord = random.choice(candidates)
-                        # print "==> pick %s" % rand_coord
-                        self.set_feature(rand_coord, CLOSED_DOOR)
-                        self.room_props[old_room].add_adjoining_room(corrs[0])
-                        self.room_props[corrs[0]].add_adjoining_room(old_room)
-                        self.doors.append(rand_coord)
-                        candidates = []
-                    old_room = curr_room
-                    thisroom = self.get_room(curr_room)
-                    startx = thisroom.pos().x
-                    starty = thisroom.pos().y
-                    stopx  = startx + thisroom.size().x - 1
-                    stopy  = starty + thisroom.size().y - 1
-                if (pos.x == startx or pos.x == stopx) and (pos.y == starty or pos.y == stopy):
-                    pass
-                    # print "pos: (%s, %s), room start: (%s, %s), room end: (%s, %s)" % (pos.x, pos.y, startx, starty, stopx, stopy)
-                else:
-                    candidates.append(pos)
+            if old_room != curr_room:
+                # We've reached another room. Time to pick a door spot for the old room.
+                if len(candidates):
+                    door_pos, door_corr = random.choice(candidates)
+                    self.set_feature(door_pos, CLOSED_DOOR)
+                    self.connect_rooms(old_room, door_corr, door_pos)
+                    self.doors.append(door_pos)
+                    candidates = []
+                old_room = curr_room
+            # Room corners are no good.
+            if is_candidate:
+                candidates.append((pos, corr))
 
         # The corridor has reached an end. Pick a door spot for the last room seen.
         if len(candidates):
-            rand_coord = random.choice(candidates)
-            # print "==> pick %s" % rand_coord
-            self.set_feature(rand_coord, CLOSED_DOOR)
-            self.doors.append(rand_coord)
-            corrs = self.get_corridor_indices(rand_coord - offset)
-            if len(corrs) > 0:
-                self.room_props[old_room].add_adjoining_room(corrs[0])
-                self.room_props[corrs[0]].add_adjoining_room(old_room)
-            else:
-                print "no corridor matching doorpos %s of room %s" % (rand_coord, old_room)
+            door_pos, door_corr = random.choice(candidates)
+            self.set_feature(door_pos, CLOSED_DOOR)
+            self.connect_rooms(old_room, door_corr, door_pos)
+            self.doors.append(door_pos)
 
     def add_doors (self):
         """
@@ -420,98 +537,57 @@ class ManorCollection (builder.BuilderCollection):
         """
         # print "Adding doors..."
         self.doors = []
-        corr = self.corridors
-        for c in corr:
-            candidates = []
-            pos = self.corridor(c).pos()
-            w   = self.corridor(c).width()
-            h   = self.corridor(c).height()
-            # print "Corridor %s: %s" % (c, self.corridor(c))
-            # Depending on the corridor's orientation, check the parallel runs
-            # to the left and right, or above and below the corridor.
-            # Walls to the left and top of a corridor position are not
-            # considered part of the corridor, so we need to use a shim
-            # to add doors on those sides as well.
-            if w > 1: # vertical corridor
-                self.add_doors_along_corridor(coord.Coord(pos.x, pos.y), coord.Coord(pos.x + w, pos.y), DIR_NORTH)
-                self.add_doors_along_corridor(coord.Coord(pos.x, pos.y), coord.Coord(pos.x + w, pos.y + h), DIR_SOUTH)
-            else: # horizontal corridor
-                self.add_doors_along_corridor(coord.Coord(pos.x, pos.y), coord.Coord(pos.x, pos.y + h), DIR_WEST)
-                self.add_doors_along_corridor(coord.Coord(pos.x, pos.y), coord.Coord(pos.x + w, pos.y + h), DIR_EAST)
+        graph = self.get_room_graph()
+        for c in self.corridors:
+            # Check the parallel runs to the left and right, or above and
+            # below the corridor.
+            for slots in graph.get_corridor_slots(c):
+                self.add_doors_along_corridor(slots)
 
     def maybe_remove_bonus_doors (self):
         """
         For some rooms with exits to more than one corridor, possibly remove
         one of these exits.
         """
+        graph = self.get_room_graph()
         for r in self.rooms:
             if coinflip():
                 continue
-            rp = self.room_props[r]
             corrs = []
-            for c in rp.adj_rooms:
-                if c in self.corridors:
+            for c in graph.neighbours(r):
+                if graph.is_corridor(c):
                     corrs.append(c)
             if len(corrs) < 2:
                 continue
 
             # Randomly pick a door adjacent to one of the corridors.
-            rm    = self.get_room(r)
-            doors = []
-            for pos in room.RoomWallIterator(rm.pos(), rm.size()):
-                if feature_is_door(self.get_feature(pos)):
-                    doors.append(pos)
-            door_pos = random.choice(doors)
-            dirs = [DIR_NORTH, DIR_SOUTH, DIR_EAST, DIR_WEST]
-            corr = None
-            for d in dirs:
-                corr = self.get_corridor_index(door_pos + d)
-                if corr != None:
-                    break
-            if corr == None:
+            door_pos, corr = random.choice(graph.get_doors(r))
+            if not graph.is_corridor(corr):
                 continue
             print "Change door pos (%s) to a wall" % door_pos
             self.features.__setitem__(door_pos, WALL)
+            self.doors.remove(door_pos)
             # Update the adjoining rooms of both room and corridor.
-            rp.adj_rooms.remove(corr)
-            self.room_props[corr].adj_rooms.remove(r)
+            self.disconnect_rooms(r, corr, door_pos)
 
-    def pick_door_along_wall (self, start, stop, offset):
+    def pick_door_along_wall (self, r, side):
         """
-        Picks a door spot for a wall specified by two coordinates.
+        Picks a door spot for a room's wall that connects to another room.
 
-        :``start``: The wall's starting position. *Required*
-        :``stop``: The wall's end position. *Required*.
-        :``offset_check``: A Coord offset to check for adjacent non-walls. *Required*.
+        :``r``: A room index. *Required*.
+        :``side``: The side of the wall, as a direction. *Required*.
         """
         candidates = []
-        for pos in coord.RectangleIterator(start, stop + 1):
+        for pos in self.get_room_graph().get_shared_cells(r, side):
             if (self.get_feature(pos) != WALL
-            or self.get_feature(pos + offset) != FLOOR):
+            or self.get_feature(pos + side) != FLOOR):
                 continue
-
-            # Make sure this wall connects to another room.
-            rooms = self.get_room_indices(pos)
-            if len(rooms) > 1:
-                candidates.append(pos)
+            candidates.append(pos)
 
         if len(candidates) == 0:
             return None
 
-        door_pos = random.choice(candidates)
-        rooms = self.get_room_indices(door_pos)
-        print "door_pos (%s) of rooms %s" % (door_pos, rooms)
-        for i1 in xrange(len(rooms)):
-            r1 = rooms[i1]
-            for i2 in xrange(i1+1, len(rooms)):
-                r2 = rooms[i2]
-                rp1 = self.room_props[r1]
-                rp2 = self.room_props[r2]
-                print "connect rooms %s and %s" % (rp1.name, rp2.name)
-                rp1.add_adjoining_room(r2)
-                rp2.add_adjoining_room(r1)
-
-        return door_pos
+        return random.choice(candidates)
 
     def add_window (self, start, stop, offset_check = DIR_NOWHERE):
         """
@@ -544,15 +620,15 @@ class ManorCollection (builder.BuilderCollection):
                 else:
                     if seen_nothing: # start already handled
                         if window == WINDOW_H:
-                            stop.x = pos.x - 1
+                            stop = coord.Coord(pos.x - 1, stop.y)
                         else:
-                            stop.y = pos.y - 1
+                            stop = coord.Coord(stop.x, pos.y - 1)
                         break
                     else:
                         if window == WINDOW_H:
-                            start.x = pos.x + 1
+                            start = coord.Coord(pos.x + 1, start.y)
                         else:
-                            start.y = pos.y + 1
+                            start = coord.Coord(start.x, pos.y + 1)
             # print "new start=%s, stop=%s" % (start, stop)
 
         full_window = False
@@ -571,11 +647,11 @@ class ManorCollection (builder.BuilderCollection):
             # move them into the centre.
             full_window = True
             if window == WINDOW_V:
-                start.y += 1
-                stop.y  -= 1
+                start = coord.Coord(start.x, start.y + 1)
+                stop  = coord.Coord(stop.x, stop.y - 1)
             else:
-                start.x += 1
-                stop.x  -= 1
+                start = coord.Coord(start.x + 1, start.y)
+                stop  = coord.Coord(stop.x - 1, stop.y)
         else:
             # Split larger windows into two smaller ones.
             midpost = length/2
@@ -593,14 +669,14 @@ class ManorCollection (builder.BuilderCollection):
             shift = random.randint(1, max(1,length/3))
             if window == WINDOW_H:
                 if coinflip():
-                    start.x += shift
+                    start = coord.Coord(start.x + shift, start.y)
                 else:
-                    stop.x  -= shift
+                    stop  = coord.Coord(stop.x - shift, stop.y)
             else:
                 if coinflip():
-                    start.y += shift
+                    start = coord.Coord(start.x, start.y + shift)
                 else:
-                    stop.y  -= shift
+                    stop  = coord.Coord(stop.x, stop.y - shift)
 
         count = 0
         for pos in coord.RectangleIterator(start, stop + 1):
@@ -658,24 +734,14 @@ class ManorCollection (builder.BuilderCollection):
         """
         Add doors to rooms that still lack them.
         """
-        door_rooms = []
-        for d in self.doors:
-            rooms = self.get_room_index(d, False)
-            if len(rooms) > 0:
-                for r in rooms:
-                    if r not in door_rooms:
-                        door_rooms.append(r)
-
+        graph = self.get_room_graph()
         rooms = self.rooms[:]
         random.shuffle(rooms)
         for r in rooms:
-            if r in door_rooms:
+            if len(graph.neighbours(r)) > 0:
                 continue
 
-            curr  = self.get_room(r)
-            start = curr.pos()
-            stop  = start + curr.size()
-            print "Room %s: %s" % (r, curr)
+            print "Room %s: %s" % (r, self.get_room(r))
 
             door_candidates = []
             rp = self.room_props[r]
@@ -684,14 +750,7 @@ class ManorCollection (builder.BuilderCollection):
                 door_dirs.remove(windir)
 
             for dd in door_dirs:
-                if dd == DIR_WEST:
-                    dpos = self.pick_door_along_wall(coord.Coord(start.x, start.y + 1), coord.Coord(start.x, stop.y - 2), DIR_WEST)
-                elif dd == DIR_EAST:
-                    dpos = self.pick_door_along_wall(coord.Coord(stop.x - 1, start.y + 1), coord.Coord(stop.x - 1, stop.y - 2), DIR_EAST)
-                elif dd == DIR_NORTH:
-                    dpos = self.pick_door_along_wall(coord.Coord(start.x + 1, start.y), coord.Coord(stop.x - 2, start.y), DIR_NORTH)
-                elif dd == DIR_SOUTH:
-                    dpos = self.pick_door_along_wall(coord.Coord(start.x + 1, stop.y - 1), coord.Coord(stop.x - 2, stop.y - 1), DIR_SOUTH)
+                dpos = self.pick_door_along_wall(r, dd)
                 if dpos != None:
                     door_candidates.append(dpos)
 
@@ -703,11 +762,14 @@ class ManorCollection (builder.BuilderCollection):
                 self.set_feature(d, OPEN_DOOR)
                 self.doors.append(d)
 
-                # Update door-less rooms.
                 other_rooms = self.get_room_indices(d)
-                for r in other_rooms:
-                    if r not in door_rooms:
-                        door_rooms.append(r)
+                print "door_pos (%s) of rooms %s" % (d, other_rooms)
+                for i1 in xrange(len(other_rooms)):
+                    for i2 in xrange(i1+1, len(other_rooms)):
+                        r1 = other_rooms[i1]
+                        r2 = other_rooms[i2]
+                        print "connect rooms %s and %s" % (self.room_props[r1].name, self.room_props[r2].name)
+                        self.connect_rooms(r1, r2, d)
 
     def assign_adjacent_rooms (self, rid):
         """
@@ -719,9 +781,10 @@ class ManorCollection (builder.BuilderCollection):
         """
         rp = self.room_props[rid]
         utility = (rp.section == "utility")
+        graph   = self.get_room_graph()
         # print "Room %s of type %s" % (rp.name, rp.section)
-        for adj in rp.adj_rooms:
-            if adj in self.get_corridors():
+        for adj in graph.neighbours(rid):
+            if graph.is_corridor(adj):
                 # print "adjacent room %s is corridor" % adj
                 continue
 
@@ -899,9 +962,10 @@ class ManorCollection (builder.BuilderCollection):
         adjoining rooms/corridors and adds their names to the list of
         adjoining room names.
         """
+        graph = self.get_room_graph()
         for r in self.get_room_corridors():
             rp = self.room_props[r]
-            for adjr in rp.adj_rooms:
+            for adjr in graph.neighbours(r):
                 rp2  = self.room_props[adjr]
                 name = rp2.room_name(True)
                 rp.add_adjoining_room_name(name)
@@ -921,36 +985,80 @@ class ManorCollection (builder.BuilderCollection):
                 if len(furniture) > 0:
                     self.add_room_furniture(r, furniture)
 
-    def get_pos_list_within_room (self, r):
+        # The layout is final now, so paths towards rooms can be cached.
+        self.init_distance_fields()
+
+    def check_room_indices (self):
         """
-        Returns a list of floor coordinates within a room that are not
-        directly adjacent to a door or window.
+        Discards the per-room indices returned by ``get_room_cells`` and
+        ``get_room_features`` if the feature grid has been changed other
+        than through ``set_feature``, or the layout has changed.
+        """
+        if self.room_index_version != self.features.version:
+            self.room_cells    = {}
+            self.room_features = {}
+            self.room_index_version = self.features.version
+
+    def get_room_cells (self, r):
+        """
+        Returns the RoomCells index of the free positions within a room,
+        creating it if necessary. Once created, the index is kept up to
+        date by ``set_feature``.
 
         :``r``: The room id. *Required*.
         """
-        rm    = self.get_room(r)
-        start = rm.pos() + 1
-        stop  = rm.pos() + rm.size() - 1
+        self.check_room_indices()
+        if r not in self.room_cells:
+            rm = self.get_room(r)
+            self.room_cells[r] = room.RoomCells(self.features, self.neighbours, rm.pos() + 1, rm.pos() + rm.size() - 2)
+        return self.room_cells[r]
 
-        candidates = []
-        for pos in coord.RectangleIterator(start, stop):
-            if self.get_feature(pos) != FLOOR:
-                continue
+    def get_room_features (self, r):
+        """
+        Returns the RoomFeatures index of the non-floor features within a
+        room, creating it if necessary. Once created, the index is kept up
+        to date by ``set_feature``.
 
-            # Never block windows or doors with furniture.
-            allowed = True
-            for adj in coord.AdjacencyIterator(pos):
-                feat = self.get_feature(adj)
-                if feature_is_door(feat) or feature_is_window(feat):
-                    allowed = False
-                    break
-            if not allowed:
-                continue
+        :``r``: The room id. *Required*.
+        """
+        self.check_room_indices()
+        if r not in self.room_features:
+            self.room_features[r] = room.RoomFeatures(self, r, [NOTHING, WALL])
+        return self.room_features[r]
 
-            # It's a valid position.
-            candidates.append(pos)
+    def update_room_indices (self, pos, old_flags):
+        """
+        Updates the per-room indices after the feature at a given position
+        has been changed. Called by ``set_feature``.
+
+        :``pos``: A coordinate within the manor. *Required*.
+        :``old_flags``: The flags of the previous feature. *Required*.
+        """
+        if len(self.room_features) > 0:
+            r = self.get_room_index(pos)
+            if r in self.room_features:
+                self.room_features[r].update(pos)
 
-        return candidates
+        if len(self.room_cells) > 0:
+            cells = [pos]
+            # Doors and windows affect where furniture may go next to them.
+            if (old_flags ^ self.features.flags(pos)) & (FLAG_DOOR | FLAG_WINDOW):
+                cells.extend(self.neighbours.adjacent_coords(pos))
+            for c in cells:
+                for r in self.get_room_indices(c):
+                    if r in self.room_cells:
+                        self.room_cells[r].update(c)
+
+        self.room_index_version = self.features.version
+
+    def get_pos_list_within_room (self, r):
+        """
+        Returns a list of floor coordinates within a room that are not
+        directly adjacent to a door or window.
+
+        :``r``: The room id. *Required*.
+        """
+        return self.get_room_cells(r).furniture_candidates()
 
     def get_nearby_interesting_feature (self, curr):
         """
@@ -959,24 +1067,29 @@ class ManorCollection (builder.BuilderCollection):
         :``curr``: The current position in the manor. *Required*.
         """
         curr_room = self.get_room_index(curr)
+        if curr_room != None:
+            # Only the room's own features need to be checked.
+            positions = self.get_room_features(curr_room).near(curr, 2)
+        else:
+            positions = []
+            for pos in coord.RectangleIterator(curr - 2, curr + 3):
+                if pos.x < 0 or pos.x >= self.size().x or pos.y < 0 or pos.y >= self.size().y:
+                    continue
+                # Make sure we stay outside of rooms.
+                if self.get_room_index(pos) == None:
+                    positions.append(pos)
+
         adj_features  = []
         features = []
-        for pos in coord.RectangleIterator(curr - 2, curr + 3):
+        for pos in positions:
             if pos == curr:
                 continue
 
-            if pos.x < 0 or pos.x >= self.size().x or pos.y < 0 or pos.y >= self.size().y:
-                continue
-
             nearby_feat = self.get_feature(pos)
             # Skip boring features.
             if nearby_feat == NOTHING or nearby_feat == WALL:
                 continue
 
-            # Make sure we stay within the same room.
-            if self.get_room_index(pos) != curr_room:
-                continue
-
             if feature_is_door(nearby_feat) or not nearby_feat.traversable():
                 if (pos.x >= curr.x - 1 and pos.y >= curr.y - 1
                 and pos.x <= curr.x + 1 and pos.y <= curr.y + 1):
@@ -1023,7 +1136,7 @@ class ManorCollection (builder.BuilderCollection):
             pos = random.choice(candidates)
             if bedcount > 1: # need an adjacent second bed
                 free_adj = []
-                for adj in coord.AdjacencyIterator(pos):
+                for adj in self.neighbours.adjacent_coords(pos):
                     if not adj in candidates:
                         continue
 
@@ -1181,6 +1294,47 @@ class ManorCollection (builder.BuilderCollection):
         """
         return self.get_room_index(pos) == self.curr_room
 
+    def get_connectivity (self, r):
+        """
+        Returns the articulation point index of a given room, computing it
+        if necessary. Once created, ``set_feature`` marks the index as out
+        of date whenever the traversability of one of its cells changes,
+        and it is recomputed by the next query.
+
+        :``r``: The room id. *Required*.
+        """
+        if self.connectivity == None:
+            self.connectivity = {}
+        if r not in self.connectivity:
+            self.connectivity[r] = pathfind.ArticulationIndex(self.features, self.get_room_cell_indices(r))
+        return self.connectivity[r]
+
+    def get_room_cell_indices (self, r):
+        """
+        Returns a list of the cell indices (``y*width+x``) belonging to a
+        given room or corridor, as in ``get_room_labels``. Only the room's
+        own rectangle is checked.
+
+        :``r``: The room or corridor id. *Required*.
+        """
+        if self.room_labels == None:
+            self.init_labels()
+        rooms, corrs = self.room_labels[0], self.corridor_labels[0]
+        size  = self.label_size
+        start = self[r].pos()
+        stop  = start + self[r].size()
+        left  = max(0, start.x)
+        right = min(stop.x, size.x)
+        cells = []
+        for y in xrange(max(0, start.y), min(stop.y, size.y)):
+            for idx in xrange(y * size.x + left, y * size.x + right):
+                label = rooms[idx]
+                if label == -1:
+                    label = corrs[idx]
+                if label == r:
+                    cells.append(idx)
+        return cells
+
     def pos_blocks_corridor (self, pos):
         """
         Returns whether placing an intraversable feature at a given position
@@ -1188,49 +1342,14 @@ class ManorCollection (builder.BuilderCollection):
 
         :``pos``: A coordinate within the manor. *Required*.
         """
-        # Temporarily mark the position intraversable to check if this
-        # would block any paths, but remember the original feature.
-        old_feat = self.get_feature(pos)
-        self.features.__setitem__(pos, NOTHING)
-
-        # Store the current room in a helper variable.
-        self.curr_room = self.get_room_index(pos)
-
-        found = True
-        north = pos + DIR_NORTH
-        south = pos + DIR_SOUTH
-        east  = pos + DIR_EAST
-        west  = pos + DIR_WEST
-        north_trav = self.get_feature(north).traversable()
-        south_trav = self.get_feature(south).traversable()
-        if north_trav and south_trav:
-            found = pathfind.Pathfind(self.features, north, south, None, self.stays_in_room).path_exists()
-            if not found:
-                print "pos (%s) blocks N/S path" % pos
-        if found:
-            east_trav = self.get_feature(east).traversable()
-            west_trav = self.get_feature(west).traversable()
-            if east_trav and west_trav:
-                found = pathfind.Pathfind(self.features, east, west, None, self.stays_in_room).path_exists()
-                if not found:
-                    print "pos (%s) blocks E/W path" % pos
-            if found and north_trav != south_trav and east_trav != west_trav:
-                if north_trav:
-                    if east_trav:
-                        found = pathfind.Pathfind(self.features, north, east, None, self.stays_in_room).path_exists()
-                    else:
-                        found = pathfind.Pathfind(self.features, north, west, None, self.stays_in_room).path_exists()
-                else:
-                    if east_trav:
-                        found = pathfind.Pathfind(self.features, south, east, None, self.stays_in_room).path_exists()
-                    else:
-                        found = pathfind.Pathfind(self.features, south, west, None, self.stays_in_room).path_exists()
-                if not found:
-                    print "pos (%s) blocks diagonal path" % pos
+        r = self.get_room_index(pos)
+        if r == None:
+            return False
 
-        # Reset to original feature.
-        self.features.__setitem__(pos, old_feat)
-        return (not found)
+        if self.get_connectivity(r).blocks(pos):
+            print "pos (%s) blocks a path in room %s" % (pos, r)
+            return True
+        return False
 
     def add_furniture_from_list (self, rp, furniture, candidates):
         """
@@ -1256,7 +1375,7 @@ class ManorCollection (builder.BuilderCollection):
                         tries -= 1
                     reduce_tries = False
                     found_wall = False
-                    for adj in coord.AdjacencyIterator(pos):
+                    for adj in self.neighbours.adjacent_coords(pos):
                         if self.get_feature(adj) == WALL:
                             found_wall = True
                             break
@@ -1280,7 +1399,7 @@ class ManorCollection (builder.BuilderCollection):
                         reduce_tries = False
 
                     chair_candidates = []
-                    for adj in coord.AdjacencyIterator(pos):
+                    for adj in self.neighbours.adjacent_coords(pos):
                         if adj not in candidates:
                             continue
                         if feature_is_floor(self.get_feature(adj)):
@@ -1308,6 +1427,160 @@ class ManorCollection (builder.BuilderCollection):
                     rp.add_furniture_name(secondary_feat_name)
                 break
 
+    def get_room_labels (self):
+        """
+        Returns a flat list, indexed by ``y*width+x``, of the room or
+        corridor index each position belongs to, or None. As with
+        ``get_room_index``, positions shared by several rooms belong to the
+        first one, and corridors only count where there's no room.
+        """
+        if self.room_labels == None:
+            self.init_labels()
+        rooms, corrs = self.room_labels[0], self.corridor_labels[0]
+        labels = []
+        for idx in xrange(len(rooms)):
+            if rooms[idx] != -1:
+                labels.append(rooms[idx])
+            elif corrs[idx] != -1:
+                labels.append(corrs[idx])
+            else:
+                labels.append(None)
+        return labels
+
+    def get_field_goals (self):
+        """
+        Returns a dictionary mapping each room and corridor index to a list
+        of the traversable cell indices belonging to it.
+        """
+        labels = self.get_room_labels()
+        goals  = {}
+        for r in self.get_room_corridors():
+            goals[r] = []
+        for idx in xrange(len(labels)):
+            if labels[idx] != None and self.field_mask[idx]:
+                goals[labels[idx]].append(idx)
+        return goals
+
+    def init_distance_fields (self):
+        """
+        Computes a distance field for each room and corridor, so that paths
+        into a room can be read off without searching.
+        """
+        self.field_mask      = pathfind.traversable_mask(self.features)
+        self.field_goals     = self.get_field_goals()
+        self.distance_fields = {}
+        for r in self.get_room_corridors():
+            self.get_distance_field(r)
+
+    def invalidate_distance_fields (self):
+        """
+        Discards the distance fields after a change of traversability.
+        They are recomputed as they are needed.
+        """
+        self.field_mask      = None
+        self.distance_fields = {}
+        self.planner         = None
+
+    def get_distance_field (self, rid):
+        """
+        Returns the distance field of a given room or corridor, computing
+        it if necessary.
+
+        :``rid``: A room or corridor index. *Required*.
+        """
+        if self.distance_fields == None:
+            self.init_distance_fields()
+        if self.field_mask == None:
+            self.field_mask  = pathfind.traversable_mask(self.features)
+            self.field_goals = self.get_field_goals()
+        if rid not in self.distance_fields:
+            self.distance_fields[rid] = pathfind.DistanceField(self.features, self.field_goals[rid], self.field_mask)
+        return self.distance_fields[rid]
+
+    def get_path_to_room (self, start, rid, target = None):
+        """
+        Returns the shortest path from a position into a given room or
+        corridor, in the format of ``Pathfind.get_path``, or None if the
+        room can't be reached.
+
+        :``start``: The starting coordinate. *Required*.
+        :``rid``: A room or corridor index. *Required*.
+        :``target``: A position within the room. If given, the path is
+                     continued inside the room up to this position.
+                     *Default None*.
+        """
+        return self.get_paths_to_rooms([(start, rid, target)])[0]
+
+    def get_paths_to_rooms (self, requests):
+        """
+        Batch version of ``get_path_to_room``: plans the paths for several
+        agents at once, sharing the distance fields of their target rooms,
+        and returns them as a list in the same order as the requests.
+
+        :``requests``: A list of ``(start, rid, target)`` tuples, with the
+                       same meaning as the parameters of
+                       ``get_path_to_room``. ``target`` may be None.
+                       *Required*.
+        """
+        cache = pathfind.PATH_CACHE
+        paths = []
+        todo  = []
+        for start, rid, target in requests:
+            goal = rid
+            if target != None:
+                goal = (rid, target.as_tuple())
+            key = cache.key(self.features, start, goal)
+            if key in cache:
+                paths.append(cache.get(key))
+            else:
+                paths.append(None)
+                todo.append((len(paths) - 1, key))
+
+        fields = {}
+        for i, key in todo:
+            fields[requests[i][1]] = self.get_distance_field(requests[i][1])
+        entries = pathfind.plan_paths(self.features, [requests[i][:2] for i, key in todo], fields)
+
+        for (i, key), path in zip(todo, entries):
+            start, rid, target = requests[i]
+            if path != None and target != None and path[0] != target:
+                # Find the remaining way within the room.
+                rest = self.get_path(path[0], target)
+                if rest == None:
+                    path = None
+                else:
+                    path = rest + path[1:]
+            cache.put(key, path)
+            paths[i] = path
+        return paths
+
+    def get_planner (self):
+        """
+        Returns the hierarchical path planner of the manor, creating it if
+        necessary. It is discarded along with the distance fields whenever
+        the traversability of a position changes.
+        """
+        if self.planner == None:
+            self.planner = pathfind.HierarchicalPathfind(self.features, self.get_room_labels(), self.field_mask)
+        return self.planner
+
+    def get_path (self, start, target):
+        """
+        Returns the shortest path between two positions, in the format of
+        ``Pathfind.get_path``, or None if there is no path. Rather than
+        searching the whole manor, the room/door graph is searched first.
+
+        :``start``: The starting coordinate. *Required*.
+        :``target``: The target coordinate. *Required*.
+        """
+        cache = pathfind.PATH_CACHE
+        key   = cache.key(self.features, start, target)
+        if key in cache:
+            return cache.get(key)
+        path = self.get_planner().get_path(start, target)
+        cache.put(key, path)
+        return path
+
     def get_bedroom_id (self, owner, rids = None, do_chance = True):
         """
         Given a person id, returns the their bedroom's room index.
@@ -1364,18 +1637,12 @@ class ManorCollection (builder.BuilderCollection):
 
     def get_random_pos_in_room (self, rid):
         """
-        Returns a random traversable position in a given room.
+        Returns a random traversable position in a given room, or None if
+        there is no such position.
 
         :``rid``: Index of a manor's room. *Required*.
         """
-        room  = self.get_room(rid)
-        start = room.pos() + 1
-        stop  = room.pos() + room.size() - 2
-
-        while True:
-            pos = coord.Coord(random.randint(start.x, stop.x), random.randint(start.y, stop.y))
-            if self.get_feature(pos).traversable():
-                return pos
+        return self.get_room_cells(rid).random_free_pos()
 
     def pick_room_for_suspect (self, rids, idx1, idx2 = None, force_adj_corr = False):
         """
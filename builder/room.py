@@ -2,7 +2,8 @@
 
 import random
 from library.coord import *
-from library import shape
+from library import shape, feature
+from library.random_util import RandomSet
 import database.database as db
 from interface.output import *
 
@@ -76,6 +77,456 @@ class RoomWallIterator (object):
     def __repr__ (self):
         return "<RoomWallIterator: %s to %s>" % (self.start, self.stop)
 
+class SharedWall (object):
+    """
+    An edge of the RoomGraph: the stretch of wall two rooms have in
+    common, or the wall of a room running alongside a corridor.
+    """
+    def __init__ (self, rooms, side):
+        """
+        Create a new SharedWall.
+
+        :``rooms``: A tuple of the two room or corridor indices. For walls
+                    along a corridor, the room comes first. *Required*.
+        :``side``: The side of the first room the wall lies on, as a
+                   direction (``DIR_NORTH`` etc.). *Required*.
+        """
+        self.rooms      = rooms
+        self.side       = side
+        self.cells      = [] # all wall positions shared by the two
+        self.candidates = [] # those not in the corner of either room
+        self.doors      = [] # doors placed in the wall, in order
+
+    def orientation (self):
+        """
+        Returns "horizontal" or "vertical", depending on the direction
+        the wall runs in.
+        """
+        if self.side == DIR_NORTH or self.side == DIR_SOUTH:
+            return "horizontal"
+        return "vertical"
+
+    def other (self, r):
+        """
+        Returns the index at the other end of the edge.
+
+        :``r``: One of the two indices of the edge. *Required*.
+        """
+        if r == self.rooms[0]:
+            return self.rooms[1]
+        return self.rooms[0]
+
+    def __repr__ (self):
+        return "<SharedWall rooms=%s,side=%s,cells=%s,doors=%s>" % (self.rooms, self.side, len(self.cells), self.doors)
+
+class RoomGraph (object):
+    """
+    The adjacency graph of the rooms and corridors of a manor, computed
+    once from its layout. Each edge is a SharedWall that records where
+    a door between its two ends could go, and where doors have been
+    placed; the rooms connected by doors can be looked up directly.
+
+    For each corridor, the graph also keeps the positions to either side
+    of it, in the order ``ManorCollection.add_doors`` considers them as
+    door spots.
+    """
+    def __init__ (self, manor):
+        """
+        Create the graph for a manor.
+
+        :``manor``: A ManorCollection. *Required*.
+        """
+        self.rooms      = manor.rooms[:]
+        self.corridors  = manor.corridors[:]
+        self.rects      = {} # index -> (top left, bottom right) corners
+        self.edges      = {} # (index, index) -> SharedWall
+        self.adjacent   = {} # index -> indices connected by doors
+        self.side_cells = {} # room -> side -> positions shared with other rooms
+        self.slots      = {} # corridor -> door spots to either side
+
+        for r in self.rooms:
+            curr = manor.get_room(r)
+            self.rects[r] = (curr.pos(), curr.pos() + curr.size() - 1)
+        for c in self.corridors:
+            curr = manor.corridor(c)
+            self.rects[c] = (curr.pos(), curr.pos() + curr.size() - 1)
+        for r in self.rects:
+            self.adjacent[r] = []
+
+        self.init_room_walls()
+        for c in self.corridors:
+            self.init_corridor_slots(manor, c)
+
+    def is_corridor (self, r):
+        """
+        Returns True if an index belongs to a corridor.
+
+        :``r``: A room or corridor index. *Required*.
+        """
+        return r in self.slots
+
+    def wall_side (self, r, pos):
+        """
+        Returns the side of a room's wall a position lies on, or None for
+        corners and positions not on the wall.
+
+        :``r``: A room index. *Required*.
+        :``pos``: A position. *Required*.
+        """
+        start, stop = self.rects[r]
+        on_x = (pos.x == start.x or pos.x == stop.x)
+        on_y = (pos.y == start.y or pos.y == stop.y)
+        if on_x == on_y:
+            return None
+        if pos.y == start.y:
+            return DIR_NORTH
+        if pos.y == stop.y:
+            return DIR_SOUTH
+        if pos.x == start.x:
+            return DIR_WEST
+        return DIR_EAST
+
+    def init_room_walls (self):
+        """
+        Adds an edge for each pair of overlapping rooms. As rooms only
+        overlap along their walls, the overlap is the shared wall.
+        """
+        for r in self.rooms:
+            self.side_cells[r] = {DIR_NORTH: [], DIR_SOUTH: [], DIR_WEST: [], DIR_EAST: []}
+
+        for i1 in xrange(len(self.rooms)):
+            r1 = self.rooms[i1]
+            start1, stop1 = self.rects[r1]
+            for i2 in xrange(i1+1, len(self.rooms)):
+                r2 = self.rooms[i2]
+                start2, stop2 = self.rects[r2]
+                if (start1.x > stop2.x or start2.x > stop1.x
+                or start1.y > stop2.y or start2.y > stop1.y):
+                    continue
+                start = Coord(max(start1.x, start2.x), max(start1.y, start2.y))
+                stop  = Coord(min(stop1.x, stop2.x), min(stop1.y, stop2.y))
+
+                if start.y == stop.y:
+                    if start.y == start1.y:
+                        side = DIR_NORTH
+                    else:
+                        side = DIR_SOUTH
+                elif start.x == start1.x:
+                    side = DIR_WEST
+                else:
+                    side = DIR_EAST
+                edge = SharedWall((r1, r2), side)
+                for pos in RectangleIterator(start, stop + 1):
+                    edge.cells.append(pos)
+                    side1 = self.wall_side(r1, pos)
+                    side2 = self.wall_side(r2, pos)
+                    # (Comparing Coords with None is slow.)
+                    if side1 is not None:
+                        self.side_cells[r1][side1].append(pos)
+                    if side2 is not None:
+                        self.side_cells[r2][side2].append(pos)
+                    if side1 is not None and side2 is not None:
+                        edge.candidates.append(pos)
+                self.edges[(r1, r2)] = edge
+
+        # A position shared by more than two rooms is only listed once,
+        # and walls are listed from top to bottom or left to right.
+        for r in self.rooms:
+            for side, cells in self.side_cells[r].items():
+                cells = list(set(cells))
+                cells.sort(key=lambda pos: (pos.x, pos.y))
+                self.side_cells[r][side] = cells
+
+    def init_corridor_slots (self, manor, c):
+        """
+        Lists the positions to either side of a corridor that belong to
+        exactly one room, and adds an edge between the corridor and each
+        of these rooms.
+
+        :``manor``: The ManorCollection. *Required*.
+        :``c``: A corridor index. *Required*.
+        """
+        size = manor.size()
+        pos  = manor.corridor(c).pos()
+        w    = manor.corridor(c).width()
+        h    = manor.corridor(c).height()
+        # Walls to the left and top of a corridor position are not
+        # considered part of the corridor, so those sides are shifted by
+        # an offset. Positions that turn out not to be walls are skipped
+        # when the doors are placed.
+        if w > 1:
+            runs = [(pos, Coord(pos.x + w, pos.y), DIR_NORTH),
+                    (pos, Coord(pos.x + w, pos.y + h), DIR_SOUTH)]
+        else:
+            runs = [(pos, Coord(pos.x, pos.y + h), DIR_WEST),
+                    (pos, Coord(pos.x + w, pos.y + h), DIR_EAST)]
+
+        self.slots[c] = []
+        for start, stop, offset in runs:
+            slots = []
+            for p in RectangleIterator(start, stop + 1):
+                dpos = p + offset
+                if (dpos.x < 2 or dpos.x >= size.x - 1
+                or dpos.y < 2 or dpos.y >= size.y - 1):
+                    continue
+                rooms = manor.get_room_indices(dpos)
+                corrs = manor.get_corridor_indices(p)
+                if len(rooms) != 1 or len(corrs) != 1:
+                    continue
+                r    = rooms[0]
+                side = self.wall_side(r, dpos)
+                rstart, rstop = self.rects[r]
+                is_candidate = not ((dpos.x == rstart.x or dpos.x == rstop.x)
+                                and (dpos.y == rstart.y or dpos.y == rstop.y))
+                slots.append((dpos, r, corrs[0], is_candidate))
+                if side is None:
+                    continue
+
+                # Usually corrs[0] == c, but a run reaches one position
+                # beyond the end of the corridor.
+                edge = self.edges.get((r, corrs[0]))
+                if edge == None:
+                    edge = SharedWall((r, corrs[0]), side)
+                    self.edges[(r, corrs[0])] = edge
+                if dpos not in edge.cells:
+                    edge.cells.append(dpos)
+                    edge.candidates.append(dpos)
+            self.slots[c].append(slots)
+
+    def get_edge (self, r1, r2):
+        """
+        Returns the SharedWall between two rooms or corridors, or None.
+
+        :``r1``: A room or corridor index. *Required*.
+        :``r2``: Another room or corridor index. *Required*.
+        """
+        if (r1, r2) in self.edges:
+            return self.edges[(r1, r2)]
+        return self.edges.get((r2, r1))
+
+    def get_edges (self, r):
+        """
+        Returns a list of all edges of a room or corridor.
+
+        :``r``: A room or corridor index. *Required*.
+        """
+        return [edge for edge in self.edges.values() if r in edge.rooms]
+
+    def neighbours (self, r):
+        """
+        Returns the list of rooms and corridors connected to a room or
+        corridor by doors, in the order they were connected.
+
+        :``r``: A room or corridor index. *Required*.
+        """
+        return self.adjacent[r]
+
+    def add_door (self, r1, r2, pos):
+        """
+        Records a door connecting two rooms or corridors.
+
+        :``r1``: A room or corridor index. *Required*.
+        :``r2``: Another room or corridor index. *Required*.
+        :``pos``: The position of the door. *Required*.
+        """
+        edge = self.get_edge(r1, r2)
+        if edge == None:
+            edge = SharedWall((r1, r2), None)
+            self.edges[(r1, r2)] = edge
+        edge.doors.append(pos)
+        if r2 not in self.adjacent[r1]:
+            self.adjacent[r1].append(r2)
+        if r1 not in self.adjacent[r2]:
+            self.adjacent[r2].append(r1)
+
+    def remove_door (self, r1, r2, pos):
+        """
+        Removes a door between two rooms or corridors. If it was the only
+        one, they are no longer connected.
+
+        :``r1``: A room or corridor index. *Required*.
+        :``r2``: Another room or corridor index. *Required*.
+        :``pos``: The position of the door. *Required*.
+        """
+        edge = self.get_edge(r1, r2)
+        edge.doors.remove(pos)
+        if len(edge.doors) == 0:
+            self.adjacent[r1].remove(r2)
+            self.adjacent[r2].remove(r1)
+
+    def get_doors (self, r):
+        """
+        Returns a list of (position, index) tuples for the doors in the walls
+        of a room, along with the room or corridor each leads to, in the
+        order RoomWallIterator visits them.
+
+        :``r``: A room index. *Required*.
+        """
+        start, stop = self.rects[r]
+        def wall_order (door):
+            pos = door[0]
+            if pos.y == start.y:
+                return (0, pos.x)
+            if pos.y == stop.y:
+                return (1, pos.x)
+            if pos.x == start.x:
+                return (2, pos.y)
+            return (3, pos.y)
+
+        doors = []
+        for edge in self.get_edges(r):
+            other = edge.other(r)
+            for pos in edge.doors:
+                doors.append((pos, other))
+        doors.sort(key=wall_order)
+        return doors
+
+    def get_shared_cells (self, r, side):
+        """
+        Returns the positions along one side of a room's wall, corners
+        excepted, that the room shares with other rooms, ordered from top
+        to bottom or left to right.
+
+        :``r``: A room index. *Required*.
+        :``side``: The side of the room, as a direction. *Required*.
+        """
+        return self.side_cells[r][side]
+
+    def get_corridor_slots (self, c):
+        """
+        Returns the possible door spots to either side of a corridor: two
+        lists, one for each side, of (position, room, corridor, candidate)
+        tuples, where candidate is False for room corners.
+
+        :``c``: A corridor index. *Required*.
+        """
+        return self.slots[c]
+
+class RoomCells (object):
+    """
+    An index of the free positions inside a room: those that are
+    traversable, and those where furniture may be placed, that is floor
+    not directly next to a door or window. ``ManorCollection.set_feature``
+    keeps it up to date.
+    """
+    def __init__ (self, features, neighbours, start, stop):
+        """
+        Create the index for a room.
+
+        :``features``: The manor's FeatureGrid. *Required*.
+        :``neighbours``: The NeighbourTable of the grid. *Required*.
+        :``start``: The top left corner of the room's inside. *Required*.
+        :``stop``: The bottom right corner of the room's inside, inclusive. *Required*.
+        """
+        self.features   = features
+        self.neighbours = neighbours
+        self.start      = start
+        self.stop       = stop
+        self.free       = RandomSet()
+        self.furniture  = set()
+        for pos in RectangleIterator(start, stop + 1):
+            self.update(pos)
+
+    def __contains__ (self, pos):
+        return (pos.x >= self.start.x and pos.x <= self.stop.x
+            and pos.y >= self.start.y and pos.y <= self.stop.y)
+
+    def update (self, pos):
+        """
+        Rechecks a position after the feature there or next to it has
+        changed. Positions outside the room are ignored.
+
+        :``pos``: A position within the manor. *Required*.
+        """
+        if pos not in self:
+            return
+
+        flags = self.features.flags(pos)
+        if flags & feature.FLAG_TRAVERSABLE:
+            self.free.add(pos)
+        else:
+            self.free.discard(pos)
+
+        # Never block windows or doors with furniture.
+        allowed = (flags & feature.FLAG_FLOOR != 0)
+        if allowed:
+            for adj in self.neighbours.adjacent_coords(pos):
+                if self.features.flags(adj) & (feature.FLAG_DOOR | feature.FLAG_WINDOW):
+                    allowed = False
+                    break
+        if allowed:
+            self.furniture.add(pos)
+        else:
+            self.furniture.discard(pos)
+
+    def random_free_pos (self):
+        """
+        Returns a random traversable position, or None if there is none.
+        """
+        return self.free.choice()
+
+    def furniture_candidates (self):
+        """
+        Returns a list of the positions furniture may be placed at, in the
+        order of a RectangleIterator over the room.
+        """
+        cells = list(self.furniture)
+        cells.sort(key=lambda pos: (pos.x, pos.y))
+        return cells
+
+class RoomFeatures (object):
+    """
+    An index of the features within a room, including its walls, that
+    aren't floor: furniture, doors, windows, stairs and so on, by position.
+    ``ManorCollection.set_feature`` keeps it up to date.
+    """
+    def __init__ (self, manor, r, ignore=[]):
+        """
+        Create the index for a room.
+
+        :``manor``: The ManorCollection. *Required*.
+        :``r``: The room id. Positions that ``manor.get_room_index`` doesn't
+                map to this room are left out. *Required*.
+        :``ignore``: Features that shouldn't be indexed, such as walls.
+                     *Default empty*.
+        """
+        self.features  = manor.features
+        self.ignore    = ignore
+        self.positions = {}
+        rm = manor.get_room(r)
+        for pos in RectangleIterator(rm.pos(), rm.pos() + rm.size()):
+            if manor.get_room_index(pos) == r:
+                self.update(pos)
+
+    def __len__ (self):
+        return len(self.positions)
+
+    def update (self, pos):
+        """
+        Rechecks a position of the room after its feature has changed.
+
+        :``pos``: A position within the room. *Required*.
+        """
+        feat = self.features[pos]
+        if feat._flags & feature.FLAG_FLOOR or feat in self.ignore:
+            if pos in self.positions:
+                del self.positions[pos]
+        else:
+            self.positions[pos] = feat
+
+    def near (self, pos, dist):
+        """
+        Returns a list of the indexed positions within a square around a
+        given position, in the order of a RectangleIterator over it.
+
+        :``pos``: The centre of the square. *Required*.
+        :``dist``: The largest distance along either axis. *Required*.
+        """
+        cells = [p for p in self.positions
+                 if abs(p.x - pos.x) <= dist and abs(p.y - pos.y) <= dist]
+        cells.sort(key=lambda p: (p.x, p.y))
+        return cells
+
 class DB_Room (object):
     """
     A database representation of a room, used to compare actual room layout
@@ -252,14 +252,36 @@ class Game (object):
 
         :``idx``: Index of the suspect list. *Required*.
         """
-        s = self.suspect_list.get_suspect(idx)
-        if rid == None:
-            rid = self.base_manor.pick_room_for_suspect(self.base_manor.rooms, idx)
-        target_pos = self.base_manor.get_random_pos_in_room(rid)
-        path = pathfind.Pathfind(self.base_manor.features, s.pos, target_pos).get_path()
-        if path != None:
+        self.set_suspect_paths([idx], [rid])
+
+    def set_suspect_paths (self, idx_list, rids = None):
+        """
+        Picks appropriate rooms for several suspects and calculates their
+        paths all at once.
+
+        :``idx_list``: A list of suspect list indices. *Required*.
+        :``rids``: A list of target rooms, one per suspect. None entries
+                   (or a rids value of None) mean a room is picked for
+                   the suspect. *Default None*.
+        """
+        if rids == None:
+            rids = [None] * len(idx_list)
+        manor    = self.base_manor
+        requests = []
+        for idx, rid in zip(idx_list, rids):
+            s = self.suspect_list.get_suspect(idx)
+            if rid == None:
+                rid = manor.pick_room_for_suspect(manor.rooms, idx)
+            target_pos = manor.get_random_pos_in_room(rid)
+            requests.append((s.pos, rid, target_pos))
+
+        paths = manor.get_paths_to_rooms(requests)
+        for idx, (pos, rid, target_pos), path in zip(idx_list, requests, paths):
+            if path == None:
+                continue
+            s = self.suspect_list.get_suspect(idx)
             s.path = path
-            rp = self.base_manor.room_props[rid]
+            rp = manor.room_props[rid]
             if self.suspect_list.murderer == idx:
                 name = "The murderer (%s)" % s.get_name()
             else:
@@ -281,6 +303,8 @@ class Game (object):
             for i in manor.room_props[r].owners:
                 rooms[i] = r
 
+        leaving    = []
+        free_rooms = None
         for i in xrange(sl.no_of_suspects()):
             if i == sl.victim:
                 continue
@@ -290,9 +314,18 @@ class Game (object):
 
             s = sl.get_suspect(i)
             s.pos = manor.get_random_pos_in_room(rooms[i])
+            if s.pos == None:
+                # No space left in the room, pick one that has some.
+                if free_rooms == None:
+                    free_rooms = [r for r in manor.rooms if len(manor.get_room_cells(r).free) > 0]
+                assert(len(free_rooms) > 0)
+                rooms[i] = random.choice(free_rooms)
+                s.pos    = manor.get_random_pos_in_room(rooms[i])
 
             if one_chance_in(5):
-                self.set_suspect_path(i)
+                leaving.append(i)
+
+        self.set_suspect_paths(leaving)
 
     def describe_body (self, p):
         """
@@ -333,15 +366,16 @@ class Game (object):
 
         assert(len(candidates) > 0)
 
+        # The grid only holds the generic body feature; the victim's name
+        # and the description of the body are kept here.
         victim_name  = sl.get_victim().get_name()
-        name         = "the mangled body of %s" % victim_name
         description  = self.describe_body(sl.get_victim())
-        description  = description[0].upper() + description[1:]
-        feat = BODY.derived_feature(name, description, has_article=True)
+        self.body_name        = "the mangled body of %s" % victim_name
+        self.body_description = description[0].upper() + description[1:]
 
         self.body_pos       = random.choice(candidates)
         sl.get_victim().pos = self.body_pos
-        self.base_manor.features.__setitem__(self.body_pos, feat)
+        self.base_manor.features.__setitem__(self.body_pos, BODY)
         rp = self.base_manor.room_props[murder_room]
 
         features = self.base_manor.get_nearby_interesting_feature(self.body_pos)
@@ -359,7 +393,7 @@ class Game (object):
                 nearby_feat = "the %s" % features[0].name(False)
             nearby_feat = " near %s" % nearby_feat
 
-        rp.description += "You see here %s%s." % (feat.name(), nearby_feat)
+        rp.description += "You see here %s%s." % (self.body_name, nearby_feat)
 
     def initialise_parameters (self):
         """
@@ -560,6 +594,8 @@ class Game (object):
                 feat = self.base_manor.get_feature(self.player_pos)
                 if feature_is_door(feat):
                     self.print_message("You see here a door.")
+                elif self.player_pos == self.body_pos:
+                    self.print_message("You see here %s." % self.body_name)
                 elif not feature_is_floor(feat):
                     self.print_message("You see here %s." % feat.name(True))
 
@@ -613,7 +649,10 @@ class Game (object):
             pos = self.player_pos
 
         feat = self.base_manor.get_feature(pos)
-        self.message = feat.description()
+        if pos == self.body_pos:
+            self.message = self.body_description
+        else:
+            self.message = feat.description()
         sl = self.suspect_list
         if pos == self.body_pos and not sl.get_victim().have_seen:
             self.message += "\nYou find an alien %s hair!" % sl.get_murderer().hair
@@ -640,7 +679,7 @@ class Game (object):
             return
 
         self.travel_target_room = room_id
-        path = pathfind.Pathfind(self.base_manor.features, self.player_pos, None, self.pos_in_travel_room).get_path()
+        path = self.base_manor.get_path_to_room(self.player_pos, room_id)
         if path != None:
             self.travel_path = path
         else:
@@ -957,7 +996,7 @@ class Game (object):
                 print "%s has reached %s." % (s.get_name(), room_name)
         else:
             valid_moves = []
-            for pos in AdjacencyIterator(s.pos):
+            for pos in manor.neighbours.adjacent_coords(s.pos):
                 if pos == self.player_pos:
                     continue
                 if not manor.get_feature(pos).traversable():
@@ -0,0 +1,11 @@
+#!/usr/bin/env python
+"""
+Generate manors in bulk. See builder/batch.py for details.
+"""
+
+import sys
+from builder import batch
+
+if __name__ == "__main__":
+    if not batch.main():
+        sys.exit(1)
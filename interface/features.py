@@ -69,17 +69,23 @@ def get_furniture_by_name(name):
 
     return NOTHING
 
+mark_features(FLAG_FLOOR, FLOOR, GRASS, COBBLES)
+mark_features(FLAG_DOOR, OPEN_DOOR, CLOSED_DOOR, LOCKED_DOOR)
+mark_features(FLAG_STAIRS, STAIR_UP, STAIR_DOWN)
+mark_features(FLAG_WINDOW, WINDOW_V, WINDOW_H)
+mark_features(FLAG_LARGE_TABLE, WORK_TABLE, DINING_TABLE, BILLIARD_TABLE)
+
 def feature_is_floor (feat):
-    return feat == FLOOR or feat == GRASS or feat == COBBLES
+    return feat._flags & FLAG_FLOOR != 0
 
 def feature_is_door (feat):
-    return feat == OPEN_DOOR or feat == CLOSED_DOOR or feat == LOCKED_DOOR
+    return feat._flags & FLAG_DOOR != 0
 
 def feature_is_stairs (feat):
-    return feat == STAIRS_UP or feat == STAIRS_DOWN
+    return feat._flags & FLAG_STAIRS != 0
 
 def feature_is_window (feat):
-    return feat == WINDOW_V or feat == WINDOW_H
+    return feat._flags & FLAG_WINDOW != 0
 
 def feature_is_large_table (feat):
-    return feat == WORK_TABLE or feat == DINING_TABLE or feat == BILLIARD_TABLE
+    return feat._flags & FLAG_LARGE_TABLE != 0
@@ -71,7 +71,7 @@ class Region (object):
         :param from_shape: The shape to blit from.
         """
         if from_shape.size() > self.size():
-            from_shape = from_shape.section(coord.Coord(0, 0), self.size())
+            from_shape = from_shape.section(coord.Coord(0, 0), self.size(), view=True)
 
         for index, char in from_shape:
             self.screen.glyphs()[index+self.start] = char
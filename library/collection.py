@@ -4,6 +4,10 @@ import shape, coord
 from collections import namedtuple
 import copy
 
+# The width and height of the buckets used to index the positions of the
+# members of a ShapeCollection.
+BUCKET_SIZE = 16
+
 class CollectionCoord (coord.Coord):
     """
     A Coord that references a specific ShapeCollection.
@@ -11,15 +15,21 @@ class CollectionCoord (coord.Coord):
     This allows for iteration over areas of a ShapeCollection and also directly
     accessing them.
     """
-    def __init__ (self, collection, c):
+    __slots__ = ('collection', )
+
+    def __new__ (cls, collection, c):
         """
         Create a new CollectionCoord.
 
         :``collection``: Which collection this references.
         :``coord``: The coordinates of that Collection.
         """
-        self.collection = collection
-        coord.Coord.__init__(self, c)
+        self = coord.Coord.__new__(cls, c)
+        object.__setattr__(self, "collection", collection)
+        return self
+
+    def __reduce__ (self):
+        return (self.__class__, (self.collection, coord.Coord(self.x, self.y)))
 
     def get (self):
         """
@@ -85,10 +95,21 @@ class ShapeCollection (object):
 
     You can also ``append`` items, ``pop`` items, assign using ShapeCollection[index]
     notation, and fetch via ShapeCollcetion[index] notation.
+
+    Point lookups (ShapeCollection[Coord]) go through an index of the bounding
+    boxes of the members, kept in a grid of ``BUCKET_SIZE`` buckets, so they
+    only look at the shapes that can contain the point. The size of the
+    collection is cached as well. Both are kept up to date by the methods of
+    the collection; if a member shape is resized in place, call ``reindex``.
     """
     _shapes = None
+    _index  = None
+    _auto   = None
+    _size   = None
     def __init__ (self, shapes=None):
         self._shapes = []
+        self._index  = None
+        self._size   = None
 
         if shapes is not None:
             for s in shapes:
@@ -101,15 +122,58 @@ class ShapeCollection (object):
                         assert isinstance(s, ShapeCoord)
                 self._shapes.append(s)
 
-    def combine (self):
+    def combine (self, sparse=False):
         """
         Converts a collection into a single Shape by drawing all ShapeCoords
         onto an automatically shaped canvas.
 
         Doesn't currently provide error checking. Should.
-        """
-        # We take the largest and work on that, ignoring its coord.
 
+        :``sparse``: If true, returns a SparseShape instead. Members that are
+                     SparseShapes are then drawn without visiting their
+                     empty space. *Default False*.
+        """
+        if sparse:
+            size = self.size()
+            base = shape.SparseShape(width=size.width, height=size.height)
+            for sc in self._shapes:
+                base.draw_on(sc.shape, sc.coord, False)
+            return base
+
+        # Work out the size of the canvas in one go, so that it can be
+        # allocated once and each member copied a row at a time. Members
+        # are drawn in order, so later ones take priority.
+        members = []
+        width, height = 0, 0
+        for sc in self._shapes:
+            member, pos = sc
+            if pos.x < 0 or pos.y < 0:
+                return self._combine_auto()
+            if isinstance(member, shape.AutoShape):
+                member = member.as_shape()
+            if not member.height():
+                continue
+            width  = max(width, pos.x + member.width())
+            height = max(height, pos.y + member.height())
+            members.append((member, pos))
+
+        base   = shape.Shape(width, height)
+        canvas = base._canvas
+        for member, pos in members:
+            if isinstance(member, shape.SparseShape):
+                base.draw_on(member, pos, False)
+                continue
+            left = pos.x
+            for y, row in enumerate(member._canvas, pos.y):
+                canvas[y][left:left + len(row)] = row
+
+        return base
+
+    def _combine_auto (self):
+        """
+        Version of ``combine`` that draws onto an AutoShape, for collections
+        with negatively offset members.
+        """
         base = shape.AutoShape()
 
         for sc in self._shapes:
@@ -122,6 +186,7 @@ class ShapeCollection (object):
         In-place sorting by size!
         """
         self._shapes.sort(cmp=lambda a, b: cmp(b.shape.size(), a.shape.size()))
+        self._index = None
 
     def append (self, item, c=None):
         """
@@ -129,16 +194,16 @@ class ShapeCollection (object):
         converted into ShapeCoords, using Coord(0, 0) as their offset. All other
         instances are not allowed.
         """
-        if isinstance(item, ShapeCoord):
-            self._shapes.append(item)
-        else:
+        if not isinstance(item, ShapeCoord):
             if c is not None:
                 item = ShapeCoord(item, c)
             elif isinstance(item, shape.Shape):
                 item = ShapeCoord(item, coord.Coord(0, 0))
 
             assert isinstance(item, ShapeCoord)
-            self._shapes.append(item)
+        self._shapes.append(item)
+        self._index_shape(len(self._shapes) - 1)
+        self._grow(item)
 
     def extend (self, items):
         """
@@ -148,7 +213,11 @@ class ShapeCollection (object):
         :``items``: An instance of ShapeCollection. *Required*.
         """
         assert isinstance(items, ShapeCollection)
+        start = len(self._shapes)
         self._shapes.extend(items)
+        for index in xrange(start, len(self._shapes)):
+            self._index_shape(index)
+            self._grow(self._shapes[index])
 
     def pop (self, index=-1):
         """
@@ -157,6 +226,8 @@ class ShapeCollection (object):
         :``index``: The index in question. *Default -1*.
         """
         item = self._shapes.pop(index)
+        self._index = None
+        self._size  = None
         return item
 
     def width (self):
@@ -175,16 +246,25 @@ class ShapeCollection (object):
         """
         Returns the size required to contain each member.
         """
-        size = coord.Size()
+        if self._size is None:
+            # An empty collection is -1 by -1.
+            self._size = (-1, -1)
+            for sc in self._shapes:
+                self._grow(sc)
 
-        for shape in self._shapes:
-            shape, c = shape
-            if shape.width() + c.x > size.width:
-                size.width = shape.width() + c.x
-            if shape.height() + c.y > size.height:
-                size.height = shape.height() + c.y
+        return coord.Size(*self._size)
 
-        return size
+    def _grow (self, sc):
+        """
+        Extend the cached size, if there is one, to contain a new member.
+
+        :``sc``: The ShapeCoord that has been added. *Required*.
+        """
+        if self._size is None:
+            return
+        shape, c = sc
+        width, height = self._size
+        self._size = (max(width, shape.width() + c.x), max(height, shape.height() + c.y))
 
     def copy (self):
         """
@@ -233,6 +313,8 @@ class ShapeCollection (object):
             new_self.append(ShapeCoord(sc.shape, coord.Coord(sc.coord + offset)))
 
         self._shapes = new_self
+        self._index  = None
+        self._size   = None
 
     def insert (self, index, item):
         """
@@ -252,9 +334,13 @@ class ShapeCollection (object):
 
         if len(self) <= index:
             self._shapes.append(item)
+            self._index_shape(len(self._shapes) - 1)
+            self._grow(item)
             return len(self) - 1
 
         self._shapes.insert(index, item)
+        self._index = None
+        self._grow(item)
         return index
 
     def __getitem__ (self, item):
@@ -274,10 +360,11 @@ class ShapeCollection (object):
             return self._shapes.__getitem__(item)
         else:
             results = []
-            for sc in self._shapes:
+            for index in self._lookup(item):
+                sc = self._shapes[index]
                 try:
                     results.append(sc.shape[item-sc.coord])
-                except:
+                except IndexError:
                     pass
             results = list(set(results))
             if len(results) == 1:
@@ -304,7 +391,9 @@ class ShapeCollection (object):
         is found in multiple shapes, it will set ``value`` in each one; if
         ``value`` is iterable and multiple instances are found, values will be
         applied from ``value[0]`` onwards. If it runs out of values in
-        ``value``, it will cease setting and return.
+        ``value``, it will cease setting and return. Members that are
+        AutoShapes also receive values for positions beyond their current
+        width or height, and grow to fit them.
 
         :``item``: Instance of Coord.
         :``value``: Either one of or a list of width one strings.
@@ -314,24 +403,36 @@ class ShapeCollection (object):
                 value = ShapeCoord(shape, coord.Coord(0, 0))
             assert isinstance(value, ShapeCoord)
             result = self._shapes.__setitem__(item, value)
+            self._index = None
+            self._size  = None
             return result
         else:
             if not isinstance(value, list):
                 value = [value] * len(self)
 
-            for sc in self._shapes:
-                if len(value) == 0:
+            # The n-th shape gets the n-th value, whether or not it
+            # contains ``item``. AutoShapes get it even if ``item`` lies
+            # beyond their current bounds (but not above or left of them),
+            # and grow to fit it.
+            indices = self._lookup(item)
+            auto    = [index for index in self._auto if item.x >= self._shapes[index].coord.x
+                       and item.y >= self._shapes[index].coord.y and index not in indices]
+            if auto:
+                indices = sorted(indices + auto)
+
+            for index in indices:
+                if index >= len(value):
                     return
 
-                tval = value.pop(0)
-
-                if item - sc.coord < (0, 0):
-                    continue
-
+                sc = self._shapes[index]
                 try:
-                    sc.shape[item-sc.coord] = tval;
+                    sc.shape[item-sc.coord] = value[index]
                 except Exception:
                     pass
+                if index in auto:
+                    # The AutoShape may have grown.
+                    self._index = None
+                    self._size  = None
 
     def reverse (self):
         """
@@ -359,6 +460,7 @@ class ShapeCollection (object):
           YYY
         """
         self._shapes.reverse()
+        self._index = None
 
     def reversed (self):
         """
@@ -454,6 +556,56 @@ class ShapeCollection (object):
 
         return new_priority
 
+    def reindex (self):
+        """
+        Rebuild the index used for point lookups, and forget the cached
+        size. This only needs to be called when a member shape has been
+        resized in place.
+        """
+        self._size  = None
+        self._index = {}
+        self._auto  = []
+        for index in xrange(len(self._shapes)):
+            self._index_shape(index)
+
+    def _index_shape (self, index):
+        """
+        Add the member at ``index`` to the buckets its bounding box covers.
+        If there is no index yet, nothing is done; it will be built from
+        scratch upon the next lookup.
+
+        :``index``: The index of the member. *Required*.
+        """
+        if self._index is None:
+            return
+        sc = self._shapes[index]
+        if isinstance(sc.shape, shape.AutoShape):
+            # These grow to fit writes outside their bounds; see __setitem__.
+            self._auto.append(index)
+        left, top = sc.coord.x, sc.coord.y
+        right  = left + sc.shape.width()
+        bottom = top + sc.shape.height()
+        if right <= left or bottom <= top:
+            return
+        entry = (index, left, top, right, bottom)
+        for by in xrange(top // BUCKET_SIZE, (bottom - 1) // BUCKET_SIZE + 1):
+            for bx in xrange(left // BUCKET_SIZE, (right - 1) // BUCKET_SIZE + 1):
+                self._index.setdefault((bx, by), []).append(entry)
+
+    def _lookup (self, pos):
+        """
+        Returns the indexes of the members whose bounding box contains
+        ``pos``, in ascending order.
+
+        :``pos``: The Coord to look up. *Required*.
+        """
+        if self._index is None:
+            self.reindex()
+        entries = self._index.get((pos.x // BUCKET_SIZE, pos.y // BUCKET_SIZE), ())
+        x, y = pos.x, pos.y
+        return sorted(index for index, left, top, right, bottom in entries
+                      if left <= x < right and top <= y < bottom)
+
     def __iter__ (self):
         """
         Creates an iterator for the ShapeCoords contained within.
@@ -32,42 +32,163 @@ class AdjacencyIterator (RectangleIterator):
     def __init__ (self, center_point, diag_too = False):
         """
         Iterator over the neighbouring points around a given location.
+        Points with negative coordinates are skipped.
 
         :``center_point``: The central point. *Required*.
         :``diag_too``: If true, diagonally adjacent points are included. *Default False*.
         """
+        self.center_point = center_point
         if diag_too:
-            self.__init__(RectangleIterator, center_point - Coord(1, 1), center_point + Coord(1, 1))
+            self.offsets = ADJACENT_ALL
         else:
-            self.center_point = center_point
+            self.offsets = ADJACENT_ORTHOGONAL
 
     def __iter__ (self):
-        dirs = [DIR_NORTH, DIR_EAST, DIR_SOUTH, DIR_WEST]
-        for d in dirs:
-            pos = self.center_point + d
-            if pos < POS_ORIGIN:
+        x = self.center_point.x
+        y = self.center_point.y
+        for dx, dy in self.offsets:
+            if x + dx < 0 or y + dy < 0:
                 continue
-            yield pos
+            yield Coord(x + dx, y + dy)
 
     def __repr__ (self):
-        return "<AdjacencyIterator: %s>" % (self.pos)
+        return "<AdjacencyIterator: %s>" % (self.center_point)
+
+# Offsets of the neighbouring points, in the order they are returned by
+# AdjacencyIterator and NeighbourTable.
+ADJACENT_ORTHOGONAL = ((0, -1), (1, 0), (0, 1), (-1, 0))
+ADJACENT_ALL        = ADJACENT_ORTHOGONAL + ((1, -1), (1, 1), (-1, 1), (-1, -1))
+
+class NeighbourTable (object):
+    """
+    Precomputed neighbours for every point of a grid of a given size. Points
+    are addressed by their packed cell index ``y*width+x``, and neighbours
+    outside the grid are clipped. Use ``get_neighbour_table`` to share the
+    tables between all users of a grid size.
+    """
+    def __init__ (self, width, height):
+        """
+        Create the tables for a new grid size.
+
+        :``width``: The width of the grid. *Required*.
+        :``height``: The height of the grid. *Required*.
+        """
+        self.width  = width
+        self.height = height
+        self.coords = [Coord(idx % width, idx / width) for idx in xrange(width * height)]
+        self.orthogonal = self.build(ADJACENT_ORTHOGONAL)
+        self.all        = self.build(ADJACENT_ALL)
+
+    def build (self, offsets):
+        """
+        Returns a list containing a tuple of neighbour indices for each cell.
+
+        :``offsets``: The offsets of the neighbouring points. *Required*.
+        """
+        width  = self.width
+        height = self.height
+        table  = []
+        for y in xrange(height):
+            for x in xrange(width):
+                adj = []
+                for dx, dy in offsets:
+                    if 0 <= x + dx < width and 0 <= y + dy < height:
+                        adj.append((y + dy) * width + x + dx)
+                table.append(tuple(adj))
+        return table
+
+    def index (self, pos):
+        """
+        Returns the cell index of a point.
+
+        :``pos``: A point within the grid. *Required*.
+        """
+        return pos.y * self.width + pos.x
+
+    def coord (self, idx):
+        """
+        Returns the point of a given cell index.
+
+        :``idx``: A cell index. *Required*.
+        """
+        return self.coords[idx]
+
+    def adjacent (self, idx, diag_too = False):
+        """
+        Returns a tuple of the cell indices adjacent to a cell.
+
+        :``idx``: A cell index. *Required*.
+        :``diag_too``: If true, diagonally adjacent cells are included. *Default False*.
+        """
+        if diag_too:
+            return self.all[idx]
+        return self.orthogonal[idx]
+
+    def adjacent_coords (self, pos, diag_too = False):
+        """
+        Returns a list of the points adjacent to a given point.
+
+        :``pos``: A point within the grid. *Required*.
+        :``diag_too``: If true, diagonally adjacent points are included. *Default False*.
+        """
+        coords = self.coords
+        return [coords[n] for n in self.adjacent(pos.y * self.width + pos.x, diag_too)]
+
+# Only the most recently requested table is kept: the grids of a manor all
+# share its size, and keeping one table per size would grow without bound
+# when generating many manors of different sizes.
+_neighbour_table = None
+
+def get_neighbour_table (size):
+    """
+    Returns the shared NeighbourTable for a given grid size.
+
+    :``size``: The size of the grid. *Required*.
+    """
+    global _neighbour_table
+    table = _neighbour_table
+    if table == None or table.width != size.x or table.height != size.y:
+        table = _neighbour_table = NeighbourTable(size.x, size.y)
+    return table
 
 class Coord (object):
     """
     Simple representation of a co-ordinate. 0,0 is assumed to be the top-left
     base co-ordinate. A co-ordinate defined as -1,-1 is assumed to be invalid.
     However, negative co-ordinates may be useful for co-ordinate arithmetic.
+
+    Coords are immutable and hashable, so they can be used as set members
+    and dictionary keys; they compare and hash equal to the corresponding
+    ``(x, y)`` tuple. In-place operators return a new Coord. Where the old
+    mutable behaviour is required, use ``MutableCoord`` instead.
     """
-    x = -1
-    y = -1
-    def __init__ (self, x=-1, y=-1):
-        if isinstance(x, tuple):
-            self.x, self.y = x
+    __slots__ = ('x', 'y')
+
+    def __new__ (cls, x=-1, y=-1):
+        if x.__class__ is int:
+            if cls is Coord and 0 <= x < CACHE_WIDTH and 0 <= y < CACHE_HEIGHT and y.__class__ is int:
+                return _cache[y * CACHE_WIDTH + x]
+        elif isinstance(x, tuple):
+            x, y = x
         elif isinstance(x, Coord):
-            self.x, self.y = x.as_tuple()
-        else:
-            self.x = x
-            self.y = y
+            x, y = x.x, x.y
+        self = object.__new__(cls)
+        _set_x(self, x)
+        _set_y(self, y)
+        return self
+
+    def __setattr__ (self, name, value):
+        raise CoordError, "Can't change the %s of immutable %r, use MutableCoord instead." % (name, self)
+
+    def __delattr__ (self, name):
+        raise CoordError, "Can't change the %s of immutable %r, use MutableCoord instead." % (name, self)
+
+    def __reduce__ (self):
+        return (self.__class__, (self.x, self.y))
+
+    def __hash__ (self):
+        return hash((self.x, self.y))
+
     def valid (self):
         return (self.x > -1 and self.y > -1)
     def as_tuple (self):
@@ -77,111 +198,46 @@ class Coord (object):
     def __repr__ (self):
         return "<Coord %s,%s>" % (self.x, self.y)
     def __add__ (self, other):
-        if isinstance(other, tuple):
-            other = self.__class__(other[0], other[1])
-        elif not isinstance(other, self.__class__):
-            other = self.__class__(other, other)
-        return self.__class__(self.x+other.x, self.y+other.y)
-    def __iadd__ (self, other):
-        if isinstance(other, tuple):
-            other = self.__class__(other[0], other[1])
-        elif not isinstance(other, self.__class__):
-            other = self.__class__(other, other)
-        self.x += other.x
-        self.y += other.y
-        return self
+        if other.__class__ is Coord:
+            return self.__class__(self.x+other.x, self.y+other.y)
+        x, y = _coerce(other)
+        return self.__class__(self.x+x, self.y+y)
     def __sub__ (self, other):
-        if isinstance(other, tuple):
-            other = self.__class__(other[0], other[1])
-        elif not isinstance(other, self.__class__):
-            other = self.__class__(other, other)
-        return self.__class__(self.x-other.x, self.y-other.y)
-    def __isub__ (self, other):
-        if isinstance(other, tuple):
-            other = self.__class__(other[0], other[1])
-        elif not isinstance(other, self.__class__):
-            other = self.__class__(other, other)
-        self.x -= other.x
-        self.y -= other.y
-        return self
+        if other.__class__ is Coord:
+            return self.__class__(self.x-other.x, self.y-other.y)
+        x, y = _coerce(other)
+        return self.__class__(self.x-x, self.y-y)
     def __mul__ (self, other):
-        if isinstance(other, tuple):
-            other = self.__class__(other[0], other[1])
-        elif not isinstance(other, self.__class__):
-            other = self.__class__(other, other)
-        return self.__class__(self.x*other.x, self.y*other.y)
-    def __imul__ (self, other):
-        if isinstance(other, tuple):
-            other = self.__class__(other[0], other[1])
-        elif not isinstance(other, self.__class__):
-            other = self.__class__(other, other)
-        self.x *= other.x
-        self.y *= other.y
-        return self
+        x, y = _coerce(other)
+        return self.__class__(self.x*x, self.y*y)
     def __div__ (self, other):
-        if isinstance(other, tuple):
-            other = self.__class__(other[0], other[1])
-        elif not isinstance(other, self.__class__):
-            other = self.__class__(other, other)
-        return self.__class__(self.x/other.x, self.y/other.y)
+        x, y = _coerce(other)
+        return self.__class__(self.x/x, self.y/y)
     def __floordiv__(self, other):
-        if isinstance(other, tuple):
-            other = self.__class__(other[0], other[1])
-        elif not isinstance(other, self.__class__):
-            other = self.__class__(other, other)
-        return self.__class__(floor(self.x/other.x), floor(self.y/other.y))
-    def __idiv__ (self, other):
-        if isinstance(other, tuple):
-            other = self.__class__(other[0], other[1])
-        elif not isinstance(other, self.__class__):
-            other = self.__class__(other, other)
-        self.x /= other.x
-        self.y /= other.y
-        return self
-    def __ifloordiv__ (self, other):
-        if isinstance(other, tuple):
-            other = self.__class__(other[0], other[1])
-        elif not isinstance(other, self.__class__):
-            other = self.__class__(other, other)
-        self.x = floor(self.x/other.x)
-        self.y = floor(self.y/other.y)
-        return self
+        x, y = _coerce(other)
+        return self.__class__(self.x//x, self.y//y)
     def __lt__ (self, other):
-        if isinstance(other, tuple):
-            other = self.__class__(other[0], other[1])
-        elif not isinstance(other, self.__class__):
-            other = self.__class__(other, other)
-        return (self.x<other.x or self.y<other.y)
+        x, y = _coerce(other)
+        return (self.x<x or self.y<y)
     def __le__ (self, other):
-        if isinstance(other, tuple):
-            other = self.__class__(other[0], other[1])
-        elif not isinstance(other, self.__class__):
-            other = self.__class__(other, other)
-        return (self.x<=other.x or self.y<=other.y)
+        x, y = _coerce(other)
+        return (self.x<=x or self.y<=y)
     def __eq__ (self, other):
-        if isinstance(other, tuple):
-            other = self.__class__(other[0], other[1])
-        elif not isinstance(other, self.__class__):
-            other = self.__class__(other, other)
-        return (self.x==other.x and self.y==other.y)
+        if other.__class__ is Coord:
+            return (self.x==other.x and self.y==other.y)
+        x, y = _coerce(other)
+        return (self.x==x and self.y==y)
     def __ne__ (self, other):
-        if isinstance(other, tuple):
-            other = self.__class__(other[0], other[1])
-        elif not isinstance(other, self.__class__):
-            other = self.__class__(other, other)
-        return (self.x!=other.x or self.y!=other.y)
+        if other.__class__ is Coord:
+            return (self.x!=other.x or self.y!=other.y)
+        x, y = _coerce(other)
+        return (self.x!=x or self.y!=y)
     def __gt__ (self, other):
-        if isinstance(other, tuple):
-            other = self.__class__(other[0], other[1])
-        elif not isinstance(other, self.__class__):
-            other = self.__class__(other, other)
-        return (self.x>other.x or self.y>other.y)
+        x, y = _coerce(other)
+        return (self.x>x or self.y>y)
     def __ge__ (self, other):
-        if isinstance(other, tuple):
-            other = self.__class__(other[0], other[1])
-        elif not isinstance(other, self.__class__):
-            other = self.__class__(other, other)
-        return (self.x>=other.x or self.y>=other.y)
+        x, y = _coerce(other)
+        return (self.x>=x or self.y>=y)
     def __iter__ (self):
         yield self.x
         yield self.y
@@ -201,13 +257,82 @@ class Coord (object):
 
         return max(dist_x, dist_y)
 
-class Size (Coord):
+_set_x = Coord.x.__set__
+_set_y = Coord.y.__set__
+
+def _coerce (other):
+    """
+    Returns the ``(x, y)`` values of a Coord, a tuple or a scalar (which is
+    used for both values).
+    """
+    if isinstance(other, Coord):
+        return other.x, other.y
+    if isinstance(other, tuple):
+        return other[0], other[1]
+    return other, other
+
+# Commonly used coordinates are only created once.
+CACHE_WIDTH  = 128
+CACHE_HEIGHT = 128
+_cache = []
+for y in xrange(CACHE_HEIGHT):
+    for x in xrange(CACHE_WIDTH):
+        c = object.__new__(Coord)
+        _set_x(c, x)
+        _set_y(c, y)
+        _cache.append(c)
+del x, y, c
+
+class MutableCoord (Coord):
+    """
+    A co-ordinate that can be changed in place, i.e. with the semantics
+    Coord used to have: ``pos.x = 5`` and ``pos += DIR_NORTH`` modify the
+    object itself rather than creating a new one. As such, it isn't
+    hashed by value.
+    """
+    __slots__ = ()
+
+    __setattr__ = object.__setattr__
+    __delattr__ = object.__delattr__
+    __hash__    = object.__hash__
+
+    def __repr__ (self):
+        return "<MutableCoord %s,%s>" % (self.x, self.y)
+    def __iadd__ (self, other):
+        x, y = _coerce(other)
+        self.x += x
+        self.y += y
+        return self
+    def __isub__ (self, other):
+        x, y = _coerce(other)
+        self.x -= x
+        self.y -= y
+        return self
+    def __imul__ (self, other):
+        x, y = _coerce(other)
+        self.x *= x
+        self.y *= y
+        return self
+    def __idiv__ (self, other):
+        x, y = _coerce(other)
+        self.x /= x
+        self.y /= y
+        return self
+    def __ifloordiv__ (self, other):
+        x, y = _coerce(other)
+        self.x //= x
+        self.y //= y
+        return self
+
+class Size (MutableCoord):
     """
     A specific representation of size using width and height.
     """
+    __slots__ = ()
+
     width = property(lambda self: self.x, lambda self, width: self.__setattr__("x", width))
     height = property(lambda self: self.y, lambda self, width: self.__setattr__("y", width))
-    def __init__ (self, width=-1, height=-1):
+    def __new__ (cls, width=-1, height=-1):
         if isinstance(width, tuple):
             height = width[1]
             width = width[0]
@@ -215,7 +340,7 @@ class Size (Coord):
             width, height = width.as_tuple()
         elif not isinstance(width, int):
             raise CoordError, "Can't use '%s' as a width." % width
-        Coord.__init__(self, width, height)
+        return MutableCoord.__new__(cls, width, height)
     def __repr__ (self):
         return "<Size width=%s height=%s>" % (self.width, self.height)
 
@@ -256,8 +381,12 @@ class AutoSize (Size):
     An automatic size. For comparative purposes, it is always larger than
     something else--never equal and never smaller.
     """
-    def __init__ (self):
-        Size.__init__(self, AutoDimension(), AutoDimension())
+    __slots__ = ()
+
+    def __new__ (cls):
+        return Size.__new__(cls, AutoDimension(), AutoDimension())
+    def __reduce__ (self):
+        return (AutoSize, ())
     def valid (self):
         return True
     def __repr__ (self):
@@ -1,7 +1,71 @@
 #!/usr/bin/env python
 
+import itertools
+from array import array
 from library import coord
 
+# Versions are drawn from a single counter, so that they are unique across
+# all grids.
+_versions = itertools.count()
+
+# Property flags of features. The first three follow from the arguments
+# a feature is created with; the others are assigned with ``mark_features``.
+FLAG_TRAVERSABLE = 1
+FLAG_NEEDS_WALL  = 2
+FLAG_CONTAINER   = 4
+FLAG_DOOR        = 8
+FLAG_WINDOW      = 16
+FLAG_FLOOR       = 32
+FLAG_LARGE_TABLE = 64
+FLAG_STAIRS      = 128
+
+class FeatureError (Exception): pass
+
+# The feature registry: features are numbered the first time they are
+# stored in a FeatureGrid, which only stores their numbers. The flags of
+# each registered feature are kept alongside. Numbers are never reused, so
+# features should be defined once rather than created anew for each game.
+_features = []
+_flags    = []
+
+# The largest number of features a FeatureGrid can store.
+MAX_FEATURES = 65536
+
+def feature_id (feat):
+    """
+    Returns the number of a feature within the registry, registering it
+    if necessary.
+
+    :``feat``: A Feature. *Required*.
+    """
+    if feat._id is None:
+        if len(_features) >= MAX_FEATURES:
+            raise FeatureError, "Can't register more than %s features." % MAX_FEATURES
+        feat._id = len(_features)
+        _features.append(feat)
+        _flags.append(feat.flags())
+    return feat._id
+
+def feature_by_id (fid):
+    """
+    Returns the registered feature with a given number.
+
+    :``fid``: A feature number, as returned by ``feature_id``. *Required*.
+    """
+    return _features[fid]
+
+def mark_features (flags, *features):
+    """
+    Adds property flags to a number of features.
+
+    :``flags``: The flags to add, for example ``FLAG_DOOR``. *Required*.
+    :``features``: The features to add them to.
+    """
+    for feat in features:
+        feat._flags |= flags
+        if feat._id is not None:
+            _flags[feat._id] = feat._flags
+
 class Feature (object):
     """
     A way of representing a specific feature in an agnostic manner. This should
@@ -10,6 +74,8 @@ class Feature (object):
     _name = None
     _description = None
     _traversable = False
+    _flags = 0
+    _id    = None
 
     def __init__ (self, name, description=None, traversable=False, needs_wall=False, is_container=False):
         """
@@ -30,6 +96,13 @@ class Feature (object):
         self._traversable  = traversable
         self._needs_wall   = needs_wall
         self._is_container = is_container
+        self._flags = 0
+        if traversable:
+            self._flags |= FLAG_TRAVERSABLE
+        if needs_wall:
+            self._flags |= FLAG_NEEDS_WALL
+        if is_container:
+            self._flags |= FLAG_CONTAINER
 
     def traversable (self):
         return self._traversable
@@ -48,6 +121,21 @@ class Feature (object):
     def is_container (self):
         return self._is_container
 
+    def flags (self):
+        """
+        Returns the property flags of this feature, ``FLAG_TRAVERSABLE``
+        and so on, as a bitmask.
+        """
+        return self._flags
+
+    def has_flag (self, flag):
+        """
+        Returns True if this feature has any of the given flags.
+
+        :``flag``: A flag or combination of flags. *Required*.
+        """
+        return self._flags & flag != 0
+
 class TextFeature (Feature):
     """
     A representation of an agnostic ``Feature`` as text. This includes a
@@ -111,6 +199,17 @@ NOTHING = TextFeature(" ", None, "nothingness", "Empty space.", False)
 class FeatureGrid (object):
     """
     A grid of Features at various positions.
+
+    Rather than the features themselves, the grid stores their numbers
+    within the feature registry in a flat array of bytes, indexed by
+    ``y*width+x``; should more than 256 features be registered, it switches
+    to two bytes per position. ``flags`` and ``traversable`` check the
+    properties of a position without looking up the feature at all.
+
+    Each grid carries a ``version`` that changes whenever a feature is
+    updated, and a ``traversal_version`` that only changes when the
+    traversability of a position changes. Both are unique across grids,
+    so they can be used as cache keys for data derived from the grid.
     """
     def __init__ (self, width, height, feat = NOTHING):
         """
@@ -120,14 +219,11 @@ class FeatureGrid (object):
         :``height``: The height of the grid. *Required*.
         :``feat``: The default feature used to initialise the grid. *Default NOTHING*.
         """
-        self.grid = []
         self._width  = width
         self._height = height
-        for row in xrange(height):
-            row = []
-            for column in xrange(width):
-                row.append(feat)
-            self.grid.append(row)
+        fid = feature_id(feat)
+        self.cells = array('B' if fid < 256 else 'H', [fid]) * (width * height)
+        self.version = self.traversal_version = next(_versions)
 
     def size (self):
         """
@@ -144,7 +240,7 @@ class FeatureGrid (object):
         # assert isinstance(pos, coord.Coord)
         assert (pos.y < self._height)
         assert (pos.x < self._width)
-        return self.grid[pos.y][pos.x]
+        return _features[self.cells[pos.y * self._width + pos.x]]
 
     def __setitem__ (self, pos, feat):
         """
@@ -156,16 +252,96 @@ class FeatureGrid (object):
         # assert isinstance(pos, coord.Coord)
         assert (pos.y < self._height)
         assert (pos.x < self._width)
-        self.grid[pos.y][pos.x] = feat
+        fid = feature_id(feat)
+        if fid >= 256 and self.cells.typecode == 'B':
+            self.cells = array('H', self.cells)
+        idx = pos.y * self._width + pos.x
+        if (_flags[self.cells[idx]] ^ _flags[fid]) & FLAG_TRAVERSABLE:
+            self.traversal_version = next(_versions)
+        self.version = next(_versions)
+        self.cells[idx] = fid
+
+    def fill (self, start, stop, feat, keep=None):
+        """
+        Sets every position of a rectangle to the same feature, a row at a
+        time. Parts of the rectangle outside the grid are ignored.
+
+        :``start``: The top left corner of the rectangle. *Required*.
+        :``stop``: The bottom right corner of the rectangle (exclusive).
+                   *Required*.
+        :``feat``: The new feature for these positions. *Required*.
+        :``keep``: If not None, positions containing this feature are left
+                   alone. *Default None*.
+        """
+        left   = max(0, start.x)
+        right  = min(stop.x, self._width)
+        top    = max(0, start.y)
+        bottom = min(stop.y, self._height)
+        if left >= right or top >= bottom:
+            return
+        fid = feature_id(feat)
+        if fid >= 256 and self.cells.typecode == 'B':
+            self.cells = array('H', self.cells)
+        keep_id = None
+        if keep != None:
+            keep_id = feature_id(keep)
+        cells   = self.cells
+        run     = array(cells.typecode, [fid]) * (right - left)
+        changed = False
+        for y in xrange(top, bottom):
+            a = y * self._width + left
+            b = y * self._width + right
+            old = cells[a:b]
+            for oid in set(old):
+                if oid != keep_id and (_flags[oid] ^ _flags[fid]) & FLAG_TRAVERSABLE:
+                    changed = True
+            if keep_id != None and keep_id in old:
+                for idx in xrange(a, b):
+                    if cells[idx] != keep_id:
+                        cells[idx] = fid
+            else:
+                cells[a:b] = run
+        if changed:
+            self.traversal_version = next(_versions)
+        self.version = next(_versions)
+
+    def flags (self, pos):
+        """
+        Returns the property flags of the feature at a given position.
+
+        :``pos``: A position within the grid. *Required*.
+        """
+        return _flags[self.cells[pos.y * self._width + pos.x]]
+
+    def traversable (self, pos):
+        """
+        Returns True if the feature at a given position is traversable.
+
+        :``pos``: A position within the grid. *Required*.
+        """
+        return _flags[self.cells[pos.y * self._width + pos.x]] & FLAG_TRAVERSABLE != 0
+
+    def mask (self, flag):
+        """
+        Returns a flat bytearray, indexed by ``y*width+x``, that is 1 for
+        every position whose feature has any of the given flags and 0
+        otherwise.
+
+        :``flag``: A flag or combination of flags. *Required*.
+        """
+        table = bytearray(1 if flags & flag else 0 for flags in _flags)
+        if self.cells.typecode == 'B':
+            # Byte-sized cells can be looked up all at once with a 256 entry
+            # translation table; the ids of the other features can't occur.
+            # Grids with two bytes per cell have to be looked up one by one.
+            table = table[:256] + bytearray(256 - min(len(table), 256))
+            return bytearray(self.cells.tostring().translate(str(table)))
+        return bytearray(table[fid] for fid in self.cells)
 
     def draw (self):
         """
         Prints the feature glyphs onto the screen. Debugging method.
         """
-        canvas = []
-        for x in xrange(self._height):
-            row = []
-            for y in xrange(self._width):
-                glyph = self.__getitem__(coord.Coord(y, x)).glyph()
-                row.append(glyph)
-            print ''.join(row)
+        for y in xrange(self._height):
+            row = self.cells[y * self._width:(y + 1) * self._width]
+            print ''.join(_features[fid].glyph() for fid in row)
@@ -1,5 +1,8 @@
 #!/usr/bin/env python
 
+import heapq
+from array import array
+from collections import OrderedDict
 from library import feature, coord
 
 INFINITY = 10000
@@ -52,24 +55,245 @@ class Grid (object):
         assert (pos.x < self._width)
         self.grid[pos.y][pos.x] = value
 
-class DistanceGrid (Grid):
+class FlatGrid (Grid):
+    """
+    A compact grid of integer values, stored in a flat array and indexed by
+    ``y*width+x``.
+
+    Rather than being reallocated, the grid is reset by increasing its
+    generation: any cell whose stamp doesn't match the current generation
+    is considered to hold the default value.
+    """
+    def __init__ (self, size, value = 0):
+        """
+        Initialise the grid with a given default value.
+
+        :``size``: A coordinate representing the size of the grid. *Required*.
+        :``value``: The default value of all cells. *Default 0*.
+        """
+        self._width  = size.x
+        self._height = size.y
+        self.default = value
+        self.values  = array('i', [value]) * (size.x * size.y)
+        self.stamps  = array('i', [0]) * (size.x * size.y)
+        self.generation = 1
+
+    def reset (self):
+        """
+        Resets all cells to the default value in constant time.
+        """
+        self.generation += 1
+
+    def index (self, pos):
+        """
+        Returns the cell index of a given position.
+
+        :``pos``: A position within the grid. *Required*.
+        """
+        return pos.y * self._width + pos.x
+
+    def get (self, idx):
+        """
+        Returns the value of the cell with a given index.
+
+        :``idx``: A cell index within the grid. *Required*.
+        """
+        if self.stamps[idx] != self.generation:
+            return self.default
+        return self.values[idx]
+
+    def set (self, idx, value):
+        """
+        Updates the value of the cell with a given index.
+
+        :``idx``: A cell index within the grid. *Required*.
+        :``value``: The new value. *Required*.
+        """
+        self.stamps[idx] = self.generation
+        self.values[idx] = value
+
+    def __getvalue__ (self, pos):
+        """
+        Returns the grid value at a given position.
+
+        :``pos``: A position within the grid. *Required*.
+        """
+        assert (pos.y < self._height)
+        assert (pos.x < self._width)
+        return self.get(pos.y * self._width + pos.x)
+
+    def __setvalue__ (self, pos, value):
+        """
+        Updates the grid value at a given position.
+
+        :``pos``: A position within the grid. *Required*.
+        :``value``: The new value. *Required*.
+        """
+        assert (pos.y < self._height)
+        assert (pos.x < self._width)
+        self.set(pos.y * self._width + pos.x, value)
+
+class DistanceGrid (FlatGrid):
     """
     A grid of distances for various positions to an initial point.
     """
     def __init__ (self, size, value = INFINITY):
-        Grid.__init__(self, size, value)
+        FlatGrid.__init__(self, size, value)
+
+class PrevGrid (FlatGrid):
+    """
+    A grid of predecessors for coordinates on a path. Predecessors are
+    stored as packed cell indices, with -1 representing None.
+    """
+    def __init__ (self, size):
+        FlatGrid.__init__(self, size, -1)
+
+    def __getvalue__ (self, pos):
+        """
+        Returns the predecessor of a given position, or None.
+
+        :``pos``: A position within the grid. *Required*.
+        """
+        idx = FlatGrid.__getvalue__(self, pos)
+        if idx == -1:
+            return None
+        return coord.Coord(idx % self._width, idx / self._width)
 
-class PrevGrid (Grid):
+    def __setvalue__ (self, pos, value):
+        """
+        Updates the predecessor of a given position.
+
+        :``pos``: A position within the grid. *Required*.
+        :``value``: The predecessor coordinate, or None. *Required*.
+        """
+        if value == None:
+            FlatGrid.__setvalue__(self, pos, -1)
+        else:
+            FlatGrid.__setvalue__(self, pos, self.index(value))
+
+class SearchBuffers (object):
     """
-    A grid of predecessors for coordinates on a path.
+    The distance, predecessor and closed grids needed for a single search.
     """
-    pass
+    def __init__ (self, size):
+        """
+        Allocate the grids for a given size.
+
+        :``size``: A coordinate representing the size of the grids. *Required*.
+        """
+        self.key    = (size.x, size.y)
+        self.dgrid  = DistanceGrid(size)
+        self.pgrid  = PrevGrid(size)
+        self.closed = FlatGrid(size, 0)
+
+    def reset (self):
+        """
+        Resets all grids to their default values.
+        """
+        self.dgrid.reset()
+        self.pgrid.reset()
+        self.closed.reset()
+
+class GridPool (object):
+    """
+    A pool of reusable search buffers, keyed by grid size. This avoids
+    allocating a fresh set of grids for every search.
+    """
+    def __init__ (self):
+        self.free = {}
+
+    def acquire (self, size):
+        """
+        Returns a reset set of search buffers of a given size, reusing
+        previously released ones where possible.
+
+        :``size``: A coordinate representing the size of the grids. *Required*.
+        """
+        free = self.free.get((size.x, size.y))
+        if free:
+            buffers = free.pop()
+            buffers.reset()
+            return buffers
+        return SearchBuffers(size)
+
+    def release (self, buffers):
+        """
+        Returns a set of search buffers to the pool.
+
+        :``buffers``: A SearchBuffers object no longer in use. *Required*.
+        """
+        self.free.setdefault(buffers.key, []).append(buffers)
+
+POOL = GridPool()
+
+class PathCache (object):
+    """
+    A least recently used cache of paths. Entries are keyed by the grid's
+    ``traversal_version``, so any change of traversability makes the old
+    entries of a grid unreachable, and they are eventually evicted.
+    """
+    def __init__ (self, capacity = 512):
+        """
+        Create a new cache.
+
+        :``capacity``: The maximum number of paths kept. *Default 512*.
+        """
+        self.capacity = capacity
+        self.paths    = OrderedDict()
+
+    def key (self, grid, start, goal):
+        """
+        Returns the cache key of a path.
+
+        :``grid``: A FeatureGrid representation of the map. *Required*.
+        :``start``: The starting coordinate. *Required*.
+        :``goal``: The target coordinate or any other hashable description
+                   of the path's goal, e.g. a room index. *Required*.
+        """
+        if isinstance(goal, coord.Coord):
+            goal = goal.as_tuple()
+        return (grid.traversal_version, start.as_tuple(), goal)
+
+    def __contains__ (self, key):
+        return key in self.paths
+
+    def get (self, key):
+        """
+        Returns a copy of a cached path (which may be None if no path
+        exists) and marks it as recently used.
+
+        :``key``: A key as returned by ``key``. *Required*.
+        """
+        path = self.paths.pop(key)
+        self.paths[key] = path
+        if path == None:
+            return None
+        return list(path)
+
+    def put (self, key, path):
+        """
+        Stores a copy of a path, evicting the least recently used one if
+        the cache is full.
+
+        :``key``: A key as returned by ``key``. *Required*.
+        :``path``: A path as returned by ``Pathfind.get_path``, or None.
+                   *Required*.
+        """
+        if key in self.paths:
+            del self.paths[key]
+        elif len(self.paths) >= self.capacity:
+            self.paths.popitem(last=False)
+        if path != None:
+            path = tuple(path)
+        self.paths[key] = path
+
+PATH_CACHE = PathCache()
 
 class Pathfind (object):
     """
     An object to handle pathfinding calculations.
     """
-    def __init__ (self, grid, start, target=None, target_condition=None, pos_condition=None):
+    def __init__ (self, grid, start, target=None, target_condition=None, pos_condition=None, diagonals=False):
         """
         Create a new Pathfind object.
 
@@ -83,16 +307,24 @@ class Pathfind (object):
         :``pos_condition``: A method taking a Coord parameter. Used to limit
                    coordinates considered for the path beyond the basic
                    traversability checks. *Default None*.
+        :``diagonals``: If true, diagonal steps are allowed. *Default False*.
         """
         assert(start < grid.size() and target < grid.size())
         assert(target != None or target_condition != None)
         self.fgrid  = grid
         self.start  = start
         self.target = target
-        self.dgrid  = DistanceGrid(self.fgrid.size(), INFINITY)
-        self.pgrid  = PrevGrid(self.fgrid.size())
+        self.buffers = None
+        self.dgrid   = None
+        self.pgrid   = None
+        self.closed  = None
         self.target_condition    = target_condition
         self.check_pos_condition = pos_condition
+        self.include_diagonals   = diagonals
+        self.neighbours = coord.get_neighbour_table(grid.size())
+        # The Manhattan heuristic is only admissible for a fixed target;
+        # an alternative target condition could be met anywhere.
+        self.use_heuristic = (target != None and target_condition == None)
 
     def path_exists (self):
         """
@@ -101,7 +333,9 @@ class Pathfind (object):
         if self.start == self.target:
             return True
 
-        return self.pathfind() != None
+        found = (self.pathfind() != None)
+        self.release_buffers()
+        return found
 
     def get_path (self):
         """
@@ -111,10 +345,37 @@ class Pathfind (object):
             return [self.start]
 
         if self.pathfind() == None:
+            self.release_buffers()
             return None
         path = self.backtrack(self.target)
+        self.release_buffers()
         return path
 
+    def acquire_buffers (self):
+        """
+        Fetches a set of distance, predecessor and closed grids from the
+        grid pool.
+        """
+        if self.buffers != None:
+            self.buffers.reset()
+            return
+        self.buffers = POOL.acquire(self.fgrid.size())
+        self.dgrid   = self.buffers.dgrid
+        self.pgrid   = self.buffers.pgrid
+        self.closed  = self.buffers.closed
+
+    def release_buffers (self):
+        """
+        Returns the grids to the grid pool once they are no longer needed.
+        """
+        if self.buffers == None:
+            return
+        POOL.release(self.buffers)
+        self.buffers = None
+        self.dgrid   = None
+        self.pgrid   = None
+        self.closed  = None
+
     def backtrack (self, begin):
         """
         Once the pathfinding is completed, this method returns a list of 
@@ -144,34 +405,65 @@ class Pathfind (object):
 
         return False
 
+    def heuristic (self, pos):
+        """
+        Returns the estimated distance between a position and the target.
+        This is the Manhattan distance (or, with diagonal steps, the
+        Chebyshev distance) if we are looking for a fixed target, and 0
+        otherwise, in which case the search degrades to a breadth-first
+        search.
+
+        :``pos``: The coordinate that is currently being looked at. *Required*.
+        """
+        if not self.use_heuristic:
+            return 0
+        if self.include_diagonals:
+            return max(abs(self.target.x - pos.x), abs(self.target.y - pos.y))
+        return abs(self.target.x - pos.x) + abs(self.target.y - pos.y)
+
+    def push (self, pos, dist):
+        """
+        Adds a position to the heap of candidate points.
+
+        Candidates are ordered by their estimated total path length, then
+        by their estimated remaining distance, and finally by insertion
+        order, so that ties are resolved the same way as in a plain
+        breadth-first search.
+
+        :``pos``: The position to be added. *Required*.
+        :``dist``: The distance of the position from the start. *Required*.
+        """
+        h = self.heuristic(pos)
+        self.counter += 1
+        heapq.heappush(self.nlist, (dist + h, h, self.counter, pos))
+
     def add_neighbours (self, curr, include_diagonals=False):
         """
         Checks all neighbouring squares of a given position and, if they
-        haven't been handled yet, adds them to a list of candidate points.
+        haven't been handled yet, adds them to the heap of candidate points.
         Also updates their distance and predecessor, as necessary.
 
         :``curr``: The current position within the grid. *Required*.
         :``include_diagonals``: If true, also checks diagonally adjacent
         squares. *Default false*.
         """
-        for pos in coord.AdjacencyIterator(curr, include_diagonals):
-            if not self.fgrid.__getitem__(pos).traversable():
+        dgrid    = self.dgrid
+        coords   = self.neighbours.coords
+        curr_idx = curr.y * dgrid._width + curr.x
+        new_dist = dgrid.get(curr_idx) + 1
+        for idx in self.neighbours.adjacent(curr_idx, include_diagonals):
+            pos = coords[idx]
+            if not self.fgrid.traversable(pos):
                 continue
             if self.check_pos_condition and not self.check_pos_condition(pos):
                 continue
 
-            new_dist = self.dgrid.__getvalue__(curr) + 1
-            if pos in self.nlist:
-                if self.dgrid.__getvalue__(pos) > new_dist:
-                    # print "Old distance(%s): %s, old prev: (%s)" % (pos, self.dgrid.__getvalue__(pos), self.pgrid.__getvalue__(pos))
-                    self.dgrid.__setvalue__(pos, new_dist)
-                    self.pgrid.__setvalue__(pos, curr)
-                    # print "Change distance(%s) to %s, prev to (%s)" % (pos, new_dist, curr)
-            elif self.dgrid.__getvalue__(pos) == INFINITY:
-                # print "Set distance(%s) to %s, prev to (%s)" % (pos, new_dist, curr)
-                self.dgrid.__setvalue__(pos, new_dist)
+            if not self.closed.get(idx) and dgrid.get(idx) > new_dist:
+                dgrid.set(idx, new_dist)
                 self.pgrid.__setvalue__(pos, curr)
-                self.nlist.append(pos)
+                # Outdated heap entries for this position are skipped
+                # once it has been closed.
+                self.push(pos, new_dist)
 
             if self.check_target(pos):
                 if self.target == None:
@@ -185,13 +477,510 @@ class Pathfind (object):
         Starts pathfinding and returns the next coordinate on the path from
         start to target, or None if no path was found.
         """
-        self.nlist = [self.start]
+        self.acquire_buffers()
+        self.nlist   = []
+        self.counter = 0
         self.dgrid.__setvalue__(self.start, 0)
+        self.push(self.start, 0)
 
+        closed = self.closed
+        width  = closed._width
         while len(self.nlist) > 0:
-            curr = self.nlist[0]
-            self.nlist.remove(curr)
-            if self.add_neighbours(curr):
+            curr = heapq.heappop(self.nlist)[-1]
+            idx  = curr.y * width + curr.x
+            if closed.get(idx):
+                continue
+            closed.set(idx, 1)
+            if self.add_neighbours(curr, self.include_diagonals):
                 return curr
-            self.nlist.sort(cmp=lambda a, b: cmp(self.dgrid.__getvalue__(a), self.dgrid.__getvalue__(b)))
         return None
+
+def traversable_mask (grid):
+    """
+    Returns a flat bytearray, indexed by ``y*width+x``, that is 1 for every
+    traversable position of a FeatureGrid and 0 otherwise.
+
+    :``grid``: A FeatureGrid representation of the map. *Required*.
+    """
+    return grid.mask(feature.FLAG_TRAVERSABLE)
+
+class DistanceField (object):
+    """
+    A precomputed map of the distances from every traversable position of a
+    grid to the nearest of a set of goal positions (also known as a Dijkstra
+    map). Once built, a path towards the goals can be read off by walking
+    downhill, without any further searching.
+    """
+    def __init__ (self, grid, goals, mask=None):
+        """
+        Create and build a new distance field.
+
+        :``grid``: A FeatureGrid representation of the map. *Required*.
+        :``goals``: A list of goal cell indices (``y*width+x``). *Required*.
+        :``mask``: A traversability mask as returned by ``traversable_mask``.
+                   If None, it is calculated from ``grid``. *Default None*.
+        """
+        size = grid.size()
+        self._width  = size.x
+        self._height = size.y
+        if mask == None:
+            mask = traversable_mask(grid)
+        self.dist = array('i', [INFINITY]) * (size.x * size.y)
+        self.neighbours = coord.get_neighbour_table(size)
+        self.build(goals, mask)
+
+    def size (self):
+        """
+        Returns the size of the field.
+        """
+        return coord.Coord(self._width, self._height)
+
+    def build (self, goals, mask):
+        """
+        Fills the field with a breadth-first search starting from all goals
+        at once.
+
+        :``goals``: A list of goal cell indices. *Required*.
+        :``mask``: A traversability mask. *Required*.
+        """
+        dist  = self.dist
+        table = self.neighbours.orthogonal
+        queue = []
+        for idx in goals:
+            if dist[idx] != 0:
+                dist[idx] = 0
+                queue.append(idx)
+
+        # Expand in rings of increasing distance.
+        d = 0
+        while queue:
+            d += 1
+            ring = []
+            for idx in queue:
+                for n in table[idx]:
+                    if mask[n] and dist[n] > d:
+                        dist[n] = d
+                        ring.append(n)
+            queue = ring
+
+    def distance (self, pos):
+        """
+        Returns the distance of a position to the nearest goal, or INFINITY
+        if no goal can be reached from it.
+
+        :``pos``: A position within the grid. *Required*.
+        """
+        return self.dist[pos.y * self._width + pos.x]
+
+    def downhill (self, pos):
+        """
+        Returns the neighbouring position with the smallest distance, or
+        None if no neighbour is closer to a goal than ``pos``.
+
+        :``pos``: A position within the grid. *Required*.
+        """
+        best      = None
+        best_dist = self.distance(pos)
+        dist      = self.dist
+        for n in self.neighbours.adjacent(pos.y * self._width + pos.x):
+            if dist[n] < best_dist:
+                best      = n
+                best_dist = dist[n]
+        if best == None:
+            return None
+        return self.neighbours.coord(best)
+
+    def get_path (self, start):
+        """
+        Returns the shortest path from ``start`` to the nearest goal, in the
+        same format as ``Pathfind.get_path``, i.e. a list of coordinates
+        beginning with the goal and ending with ``start``. Returns None if
+        no goal can be reached.
+
+        :``start``: The starting coordinate. *Required*.
+        """
+        path = [start]
+        curr = start
+        while self.distance(curr) > 0:
+            curr = self.downhill(curr)
+            if curr == None:
+                return None
+            path.append(curr)
+        path.reverse()
+        return path
+
+class ArticulationIndex (object):
+    """
+    An index of the articulation points of a set of cells, i.e. the
+    traversable positions that, if blocked, would split the remaining
+    traversable cells into disconnected parts.
+    """
+    def __init__ (self, grid, cells):
+        """
+        Create a new index. The articulation points are computed by the
+        first call to ``blocks``.
+
+        :``grid``: A FeatureGrid representation of the map. *Required*.
+        :``cells``: A list of cell indices (``y*width+x``) the index is
+                    restricted to, for example the cells of a room. *Required*.
+        """
+        self.fgrid  = grid
+        self._width = grid.size().x
+        self.table  = coord.get_neighbour_table(grid.size())
+        self.cells  = set(cells)
+        self.points = None
+
+    def __contains__ (self, pos):
+        """
+        Returns whether a position is one of the cells covered by the index.
+
+        :``pos``: A position within the grid. *Required*.
+        """
+        return pos.y * self._width + pos.x in self.cells
+
+    def blocks (self, pos):
+        """
+        Returns whether blocking a given position would disconnect any of
+        the other traversable cells from each other.
+
+        :``pos``: A position within the grid. *Required*.
+        """
+        if self.points == None:
+            self.update()
+        return pos.y * self._width + pos.x in self.points
+
+    def invalidate (self):
+        """
+        Marks the articulation points as out of date, so that they're
+        recomputed by the next call to ``blocks``. This needs to be called
+        whenever the traversability of one of the cells changes.
+        """
+        self.points = None
+
+    def neighbours (self, idx, nodes):
+        """
+        Returns those orthogonal neighbours of a cell that are nodes of the
+        graph.
+
+        :``idx``: A cell index. *Required*.
+        :``nodes``: The set of traversable cell indices. *Required*.
+        """
+        return [n for n in self.table.orthogonal[idx] if n in nodes]
+
+    def update (self):
+        """
+        Recomputes the articulation points with an iterative version of
+        Tarjan's algorithm.
+        """
+        nodes = set()
+        for idx in self.cells:
+            if self.fgrid.traversable(self.table.coord(idx)):
+                nodes.add(idx)
+
+        disc   = {}
+        low    = {}
+        points = set()
+        timer  = 0
+        for root in nodes:
+            if root in disc:
+                continue
+            disc[root] = low[root] = timer
+            timer += 1
+            children = 0
+            stack = [(root, iter(self.neighbours(root, nodes)))]
+            parent = {root: None}
+            while stack:
+                v, it = stack[-1]
+                advanced = False
+                for w in it:
+                    if w not in disc:
+                        disc[w] = low[w] = timer
+                        timer += 1
+                        parent[w] = v
+                        stack.append((w, iter(self.neighbours(w, nodes))))
+                        advanced = True
+                        break
+                    elif w != parent[v]:
+                        low[v] = min(low[v], disc[w])
+                if advanced:
+                    continue
+
+                stack.pop()
+                u = parent[v]
+                if u == None:
+                    continue
+                low[u] = min(low[u], low[v])
+                if u == root:
+                    children += 1
+                elif low[v] >= disc[u]:
+                    points.add(u)
+
+            if children > 1:
+                points.add(root)
+
+        self.points = points
+
+class HierarchicalPathfind (object):
+    """
+    A two-level path planner for maps that are partitioned into regions, such
+    as the rooms and corridors of a manor.
+
+    Positions along region boundaries ("portals", e.g. doors and corridor
+    junctions) form an abstract graph, in which portals of the same region
+    are connected by their distance within that region. A query first
+    searches this graph and then stitches together the cached paths between
+    portals, so that its cost depends on the number of regions crossed
+    rather than the number of positions.
+    """
+    def __init__ (self, grid, labels, mask=None):
+        """
+        Create a new planner.
+
+        :``grid``: A FeatureGrid representation of the map. *Required*.
+        :``labels``: A flat list, indexed by ``y*width+x``, of the region
+                     each position belongs to. *Required*.
+        :``mask``: A traversability mask as returned by ``traversable_mask``.
+                   If None, it is calculated from ``grid``. *Default None*.
+        """
+        size = grid.size()
+        self._width  = size.x
+        self._height = size.y
+        self.table   = coord.get_neighbour_table(size)
+        self.labels  = labels
+        if mask == None:
+            mask = traversable_mask(grid)
+        self.mask = mask
+        self.build()
+
+    def neighbours (self, idx):
+        """
+        Returns the cell indices of the traversable orthogonal neighbours of
+        a cell.
+
+        :``idx``: A cell index. *Required*.
+        """
+        mask = self.mask
+        return [n for n in self.table.orthogonal[idx] if mask[n]]
+
+    def build (self):
+        """
+        Collects the portals of each region and the links between portals
+        of neighbouring regions.
+        """
+        labels = self.labels
+        self.portals = {} # region -> list of portal cells
+        self.links   = {} # portal cell -> adjacent portals of other regions
+        self.trees   = {} # portal cell -> cached search within its region
+        for idx in xrange(len(self.mask)):
+            if not self.mask[idx]:
+                continue
+            for n in self.neighbours(idx):
+                if labels[n] != labels[idx]:
+                    self.links.setdefault(idx, []).append(n)
+            if idx in self.links:
+                self.portals.setdefault(labels[idx], []).append(idx)
+
+    def search_region (self, source):
+        """
+        Performs a breadth-first search from a cell that doesn't leave the
+        cell's region, and returns the distances and predecessors found.
+
+        :``source``: A cell index. *Required*.
+        """
+        labels = self.labels
+        region = labels[source]
+        dist   = {source: 0}
+        prev   = {source: None}
+        queue  = [source]
+        for idx in queue:
+            d = dist[idx] + 1
+            for n in self.neighbours(idx):
+                if n not in dist and labels[n] == region:
+                    dist[n] = d
+                    prev[n] = idx
+                    queue.append(n)
+        return (dist, prev)
+
+    def get_tree (self, portal):
+        """
+        Returns the (cached) search results within the region of a portal.
+
+        :``portal``: A portal cell index. *Required*.
+        """
+        if portal not in self.trees:
+            self.trees[portal] = self.search_region(portal)
+        return self.trees[portal]
+
+    def backtrack (self, prev, idx):
+        """
+        Returns the list of cells leading from ``idx`` to the root of a
+        search tree.
+
+        :``prev``: The predecessor dictionary of a search. *Required*.
+        :``idx``: A cell index reached by the search. *Required*.
+        """
+        cells = []
+        while idx != None:
+            cells.append(idx)
+            idx = prev[idx]
+        return cells
+
+    def plan (self, s, g, start_tree, goal_tree):
+        """
+        Searches the abstract portal graph and returns the list of portals
+        visited between two cells, or None if they aren't connected.
+
+        :``s``: The starting cell index. *Required*.
+        :``g``: The target cell index. *Required*.
+        :``start_tree``: The search results within the start region. *Required*.
+        :``goal_tree``: The search results within the target region. *Required*.
+        """
+        labels  = self.labels
+        goal    = -1
+        best    = {}
+        came    = {}
+        heap    = []
+        counter = 0
+
+        def relax (node, cost, parent):
+            if node not in best or cost < best[node]:
+                best[node] = cost
+                came[node] = parent
+                heapq.heappush(heap, (cost, counter, node))
+
+        start_dist = start_tree[0]
+        if g in start_dist:
+            relax(goal, start_dist[g], s)
+        for p in self.portals.get(labels[s], []):
+            if p in start_dist:
+                counter += 1
+                relax(p, start_dist[p], s)
+
+        goal_dist = goal_tree[0]
+        done = set()
+        while heap:
+            cost, c, node = heapq.heappop(heap)
+            if node in done:
+                continue
+            done.add(node)
+            if node == goal:
+                break
+            if labels[node] == labels[g] and node in goal_dist:
+                counter += 1
+                relax(goal, cost + goal_dist[node], node)
+            for n in self.links[node]:
+                counter += 1
+                relax(n, cost + 1, node)
+            dist = self.get_tree(node)[0]
+            for p in self.portals[labels[node]]:
+                if p != node and p in dist:
+                    counter += 1
+                    relax(p, cost + dist[p], node)
+
+        if goal not in done:
+            return None
+
+        route = []
+        node  = came[goal]
+        while node != s:
+            route.append(node)
+            node = came[node]
+        route.reverse()
+        return route
+
+    def get_path (self, start, target):
+        """
+        Returns the shortest path from ``start`` to ``target`` in the same
+        format as ``Pathfind.get_path``, i.e. a list of coordinates beginning
+        with ``target`` and ending with ``start``, or None if there is no
+        path.
+
+        :``start``: The starting coordinate. *Required*.
+        :``target``: The target coordinate. *Required*.
+        """
+        width = self._width
+        s = start.y * width + start.x
+        g = target.y * width + target.x
+        if s == g:
+            return [start]
+        if not self.mask[g]:
+            return None
+
+        start_tree = self.search_region(s)
+        goal_tree  = self.search_region(g)
+        route = self.plan(s, g, start_tree, goal_tree)
+        if route == None:
+            return None
+
+        # Stitch together the segments between consecutive portals.
+        cells = [s]
+        prev  = s
+        tree  = start_tree
+        for p in route:
+            if self.labels[p] == self.labels[prev]:
+                segment = self.backtrack(tree[1], p)
+                segment.reverse()
+                cells.extend(segment[1:])
+            else:
+                cells.append(p)
+            prev = p
+            tree = self.get_tree(p)
+        segment = self.backtrack(goal_tree[1], prev)
+        cells.extend(segment[1:])
+
+        coords = self.table.coords
+        return [coords[idx] for idx in reversed(cells)]
+
+def plan_paths (grid, requests, fields=None, mask=None):
+    """
+    Plans the paths of several agents at once and returns them as a list,
+    in the same order as the requests and in the format of
+    ``Pathfind.get_path``. Unreachable or intraversable goals result in
+    None, and goals that are neither a coordinate nor the key of one of
+    the ``fields`` raise a KeyError.
+
+    Requests sharing a goal also share a single reverse search from that
+    goal, in the form of a distance field, instead of each running its own
+    search. Goals requested only once are searched for with A*.
+
+    :``grid``: A FeatureGrid representation of the map. *Required*.
+    :``requests``: A list of ``(start, goal)`` tuples. The goal is either
+                   a coordinate or the key of a distance field in
+                   ``fields``, e.g. a room index. *Required*.
+    :``fields``: A dictionary of distance fields to reuse. Fields built
+                 for shared coordinate goals are added to it, keyed by
+                 the goal's coordinate tuple. *Default None*.
+    :``mask``: A traversability mask as returned by ``traversable_mask``.
+               If None, it is calculated when first needed. *Default None*.
+    """
+    if fields == None:
+        fields = {}
+
+    def goal_key (goal):
+        if isinstance(goal, coord.Coord):
+            return goal.as_tuple()
+        return goal
+
+    counts = {}
+    for start, goal in requests:
+        key = goal_key(goal)
+        counts[key] = counts.get(key, 0) + 1
+
+    width = grid.size().x
+    paths = []
+    for start, goal in requests:
+        key = goal_key(goal)
+        if key not in fields:
+            if not isinstance(goal, coord.Coord):
+                raise KeyError, "No distance field for goal %s." % (goal,)
+            if not grid.traversable(goal):
+                paths.append(None)
+                continue
+            if counts[key] == 1:
+                paths.append(Pathfind(grid, start, goal).get_path())
+                continue
+            if mask == None:
+                mask = traversable_mask(grid)
+            fields[key] = DistanceField(grid, [goal.y * width + goal.x], mask)
+        paths.append(fields[key].get_path(start))
+    return paths
@@ -15,3 +15,65 @@ def one_chance_in (n):
     Returns True with a 1/n chance.
     """
     return (random.randint(1,n) == 1)
+
+##################################################
+# Containers
+class RandomSet (object):
+    """
+    A set that a random member can be picked from in constant time. The
+    members are kept in a list, along with a dictionary mapping each
+    member to its place within the list; removing a member moves the last
+    one into its place.
+    """
+    def __init__ (self, members=[]):
+        """
+        Create a new RandomSet.
+
+        :``members``: The initial members. *Default empty*.
+        """
+        self._members = []
+        self._index   = {}
+        for m in members:
+            self.add(m)
+
+    def __len__ (self):
+        return len(self._members)
+
+    def __contains__ (self, member):
+        return member in self._index
+
+    def __iter__ (self):
+        return iter(self._members[:])
+
+    def add (self, member):
+        """
+        Adds a member, unless it's already in the set.
+
+        :``member``: A hashable object. *Required*.
+        """
+        if member in self._index:
+            return
+        self._index[member] = len(self._members)
+        self._members.append(member)
+
+    def discard (self, member):
+        """
+        Removes a member, if it's in the set.
+
+        :``member``: A hashable object. *Required*.
+        """
+        if member not in self._index:
+            return
+        idx  = self._index.pop(member)
+        last = self._members.pop()
+        if idx < len(self._members):
+            self._members[idx] = last
+            self._index[last]  = idx
+
+    def choice (self):
+        """
+        Returns a random member, or None if the set is empty.
+        """
+        if len(self._members) == 0:
+            return None
+        return random.choice(self._members)
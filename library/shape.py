@@ -12,6 +12,7 @@ classes.
 
 """
 
+import bisect
 import coord
 import collection
 import warnings
@@ -225,11 +226,17 @@ class Shape (object):
 
     Direct glyph access is provided by Shape[x][y], Shape[Coord(x, y)].
 
+    The width of the shape is cached, and reset by the methods that change
+    the length of rows (``normalise``, ``trim`` and ``pad``); code that
+    replaces or resizes rows of the canvas directly should reset
+    ``_max_width`` to None.
+
     Row and column access by ``row(number)`` and ``column(number)``. The ShapeRow
     and ShapeColumns respectively returned by these are references to the Shape.
     Modifications made to these will be reflected in the Shape.
     """
     _canvas = None
+    _max_width = None
     def __init__ (self, *args, **kwargs):
         """
         Create a new shape.
@@ -291,21 +298,18 @@ class Shape (object):
                 raise ShapeError, "Unexpected arguments for Shape::__init__: '%s'." % (', '.join([str(x) for x in args[3:]]))
 
         self._canvas = []
+        self._max_width = None
         if not sh_list:
             for row in xrange(height):
-                row = []
-                for columnn in xrange(width):
-                    row.append(fill)
-                self._canvas.append(row)
+                self._canvas.append([fill] * width)
         else:
+            if isinstance(sh_list, SparseShape):
+                sh_list = sh_list.as_shape()
             if isinstance(sh_list, Shape):
                 sh_list = sh_list._canvas
 
             for row in sh_list:
-                nrow = []
-                for column in row:
-                    nrow.append(column)
-                self._canvas.append(nrow)
+                self._canvas.append(list(row))
 
             if width != 0 and width > self.width():
                 self.normalise(width=width, fill=fill)
@@ -318,13 +322,13 @@ class Shape (object):
         shape. *Note: rows padded with None are not equivalent in length
         to rows without padding.*
         """
-        width = 0
-        for row in self._canvas:
-            if not row:
-                continue
-            if len(row) > width:
-                width = len(row)
-        return width 
+        if self._max_width is None:
+            width = 0
+            for row in self._canvas:
+                if len(row) > width:
+                    width = len(row)
+            self._max_width = width
+        return self._max_width
 
     def height (self):
         """
@@ -450,17 +454,15 @@ class Shape (object):
             self._canvas = [[]]
 
         if width:
-            for i in xrange(len(self._canvas)):
-                while len(self._canvas[i]) < width:
-                    self._canvas[i].append(fill)
+            for row in self._canvas:
+                if len(row) < width:
+                    row.extend([fill] * (width - len(row)))
+            self._max_width = None
         if height:
             if not width:
                 width = self.width()
             while len(self._canvas) < height:
-                new_row = []
-                while len(new_row) < width:
-                    new_row.append(fill)
-                self._canvas.append(new_row)
+                self._canvas.append([fill] * width)
 
     def trim (self, width=None, height=None, trim_left=False, trim_top=False):
         """
@@ -486,21 +488,20 @@ class Shape (object):
         assert height is None or isinstance(height, int)
 
         if width is not None:
-            if trim_left:
-                pop = 0
-            else:
-                pop = -1
-            for i in xrange(len(self._canvas)):
-                while len(self._canvas[i]) > width:
-                    self._canvas[i].pop(pop)
+            for row in self._canvas:
+                if len(row) > width:
+                    if trim_left:
+                        del row[:len(row) - width]
+                    else:
+                        del row[width:]
+            self._max_width = None
 
-        if height is not None:
+        if height is not None and len(self._canvas) > height:
             if trim_top:
-                pop = 0
+                del self._canvas[:len(self._canvas) - height]
             else:
-                pop = -1
-            while len(self._canvas) > height:
-                self._canvas.pop(pop)
+                del self._canvas[height:]
+            self._max_width = None
 
     def pad (self, num_cols=0, num_rows=0, fill=None):
         """
@@ -526,17 +527,16 @@ class Shape (object):
             self._canvas = [[]]
 
         if num_cols:
-            for i in xrange(len(self._canvas)):
-                while len(self._canvas[i]) < num_cols:
-                    self._canvas[i].insert(0, fill)
+            for row in self._canvas:
+                if len(row) < num_cols:
+                    row[0:0] = [fill] * (num_cols - len(row))
+            self._max_width = None
         if num_rows:
             if not num_cols:
                 num_cols = self.width()
-            while len(self._canvas) < num_rows:
-                new_row = []
-                while len(new_row) < num_cols:
-                    new_row.append(fill)
-                self._canvas.insert(0, new_row)
+            if len(self._canvas) < num_rows:
+                new_rows = [[fill] * num_cols for i in xrange(num_rows - len(self._canvas))]
+                self._canvas[0:0] = new_rows
 
     def draw_on (self, shape, offset=coord.Coord(0, 0), check_conflict=True, conflict_error=False):
         """
@@ -546,8 +546,9 @@ class Shape (object):
         None), but by default it will simply ignore errors.
 
         :``shape``: The shape which will be drawn upon this one. It is
-                    presumed that this shape can be contained by self.
-                    *Required*.
+                    presumed that this shape can be contained by self. This
+                    may also be a SparseShape, in which case only its runs
+                    of glyphs are drawn. *Required*.
         :``offset``: The co-ordinates to begin drawing at (ie, starting with
                      the top left corner of ``shape`` (0, 0), it will begin
                      drawing from here). *Default 0, 0*.
@@ -559,8 +560,80 @@ class Shape (object):
                              Catching this error allows the detection of
                              accidental overwriting. *Default False*.
         """
+        if isinstance(shape, SparseShape):
+            return self._draw_spans(shape, offset, check_conflict, conflict_error)
         assert isinstance(shape, Shape)
         assert coord.Size(offset)+shape.size() <= self.size()
+        if not self._fits(shape._canvas, offset):
+            # Let the cell by cell version deal with negative offsets and
+            # overlong rows.
+            return self._draw_cells(shape, offset, check_conflict, conflict_error)
+
+        # Copy whole row slices, unless there's something to check.
+        canvas = self._canvas
+        left   = offset.x
+        for y, src in enumerate(shape._canvas):
+            dst   = canvas[offset.y + y]
+            right = left + len(src)
+            if not check_conflict or dst[left:right].count(None) == len(src):
+                dst[left:right] = src
+                continue
+            for x in xrange(len(src)):
+                if dst[left + x] is not None:
+                    if conflict_error:
+                        raise ShapeError, "Tried to blit foreign '%s' onto '%s' at %s!" % (src[x], dst[left + x], coord.Coord(left + x, offset.y + y))
+                    continue
+                dst[left + x] = src[x]
+
+    def _fits (self, rows, offset):
+        """
+        Returns whether a list of rows can be copied onto the canvas at a
+        given offset without any row extending past the canvas.
+
+        :``rows``: A list of rows of glyphs. *Required*.
+        :``offset``: The co-ordinates of the top left corner. *Required*.
+        """
+        if offset.x < 0 or offset.y < 0 or offset.y + len(rows) > len(self._canvas):
+            return False
+        for y, row in enumerate(rows):
+            if offset.x + len(row) > len(self._canvas[offset.y + y]):
+                return False
+        return True
+
+    def _draw_spans (self, shape, offset, check_conflict, conflict_error):
+        """
+        Version of ``draw_on`` for SparseShapes, skipping their empty space.
+        """
+        assert coord.Size(offset)+shape.size() <= self.size()
+        canvas = self._canvas
+        for pos, src in shape.spans():
+            left = pos.x + offset.x
+            y    = pos.y + offset.y
+            if left < 0 or y < 0 or left + len(src) > len(canvas[y]):
+                for x, glyph in enumerate(src):
+                    nxy = coord.Coord(left + x, y)
+                    if check_conflict and self[nxy] != None:
+                        if conflict_error:
+                            raise ShapeError, "Tried to blit foreign '%s' onto '%s' at %s!" % (glyph, self[nxy], nxy)
+                        continue
+                    self[nxy] = glyph
+                continue
+            dst   = canvas[y]
+            right = left + len(src)
+            if not check_conflict or dst[left:right].count(None) == len(src):
+                dst[left:right] = src
+                continue
+            for x in xrange(len(src)):
+                if dst[left + x] is not None:
+                    if conflict_error:
+                        raise ShapeError, "Tried to blit foreign '%s' onto '%s' at %s!" % (src[x], dst[left + x], coord.Coord(left + x, y))
+                    continue
+                dst[left + x] = src[x]
+
+    def _draw_cells (self, shape, offset, check_conflict, conflict_error):
+        """
+        Cell by cell version of ``draw_on``.
+        """
         for xy, char in shape:
             nxy = xy+offset
             if check_conflict and self[nxy] != None:
@@ -570,7 +643,7 @@ class Shape (object):
                     continue
             self[nxy] = char
 
-    def section (self, section_start, section_stop=None):
+    def section (self, section_start, section_stop=None, view=False):
         """
         Return a new Shape containing within it the content of the current shape
         from ``section_start`` to ``section_stop``.
@@ -581,6 +654,9 @@ class Shape (object):
                             Coord(0, 0) to ``section_stop``.
         :``section_stop``: The bottom right co-ordinates of the rectangle. See
                            note regarding ``section_start``. *Default None*.
+        :``view``: If true, return a read-only ShapeView of the section
+                   that shares this shape's canvas instead of a copy.
+                   *Default False*.
         """
         if section_stop is None:
             section_stop = section_start
@@ -588,8 +664,18 @@ class Shape (object):
 
         assert section_start < section_stop
 
+        if view:
+            return ShapeView(self, section_start, section_stop - section_start)
+
         offset = section_stop - section_start
 
+        rows = self._canvas[section_start.y:section_stop.y]
+        if (section_start.x >= 0 and section_start.y >= 0 and len(rows) == offset.y
+            and all(len(row) >= section_stop.x for row in rows)):
+            new_shape = Shape()
+            new_shape._canvas = [row[section_start.x:section_stop.x] for row in rows]
+            return new_shape
+
         new_shape = Shape(offset.x, offset.y)
         for c in coord.RectangleIterator(section_start, section_stop):
             new_shape[c-section_start] = self[c]
@@ -600,8 +686,8 @@ class Shape (object):
         """
         Iterate over the entire canvas and set every square to None.
         """
-        for spot, glyph in self:
-            self[spot] = None
+        for row in self._canvas:
+            row[:] = [None] * len(row)
 
     def center (self):
         """
@@ -677,20 +763,19 @@ class Shape (object):
         Translate a Shape into a string. None values are replaced with " ", and
         new lines ("\\n") are inserted at the end of each row.
         """
-        result = ""
-        for rownum, row in enumerate(self._canvas):
-            for column in row:
-                if column is None:
-                    result += " "
-                else:
-                    result += column
-            if rownum < len(self._canvas)-1:
-                result += "\n"
-        return result
+        rows = []
+        for row in self._canvas:
+            rows.append("".join([" " if column is None else column for column in row]))
+        return "\n".join(rows)
 
 class AutoShape (Shape):
     """
     An unsized Shape that expands to suit needs.
+
+    The actual size is tracked separately from the canvas, which grows
+    geometrically (the same way lists do) so that writing beyond the current
+    bounds is cheap. Spare capacity is cut off again whenever an operation
+    needs the exact canvas, and by ``as_shape``.
     """
     def __init__ (self, fill=None):
         """
@@ -700,6 +785,8 @@ class AutoShape (Shape):
         """
         self.fill = fill
         Shape.__init__(self, 0, 0, fill=fill)
+        self._width  = 0
+        self._height = 0
 
     def size (self):
         """
@@ -723,68 +810,162 @@ class AutoShape (Shape):
         "infinite" height. To get the actual height of the shape, use
         ``AutoShape::actual_width``.
         """
-        return AutoDimension()
-
-    def _actual_wrapper (function):
-        """
-        Performs hot-swapping of actual_width, actual_height and actual_size
-        into the relevant width, height and size functions before executing
-        the function. Once performed, hot-swaps the functions back again.
+        return coord.AutoDimension()
 
-        :``function``: The function to be wrapped.
+    def actual_width (self):
         """
-        def _wrapper (self, *args, **kwargs):
-            oh = self.height
-            self.height = self.actual_height
-            ow = self.width
-            self.width = self.actual_width
-            os = self.size
-            self.size = self.actual_size
-            ah = self.actual_height
-            def cleanup():
-                self.height = oh
-                self.width = ow
-                self.size = os
-            try:
-                result = function(self, *args, **kwargs)
-            except:
-                cleanup()
-                raise
-
-            cleanup()
-            return result
-
-        _wrapper.__name__ = function.__name__
-        _wrapper.__doc__ =  function.__doc__
-        _wrapper.__wraps__ = function
-        return _wrapper
-
-    actual_width = _actual_wrapper(Shape.width)
-    actual_width.__doc__ = """
         To compensate for automatic sizing, actual widths of the AutoShape are
         accessed via suffixing "actual" to the function name.
         """
+        return self._width
 
-    actual_height = _actual_wrapper(Shape.height)
-    actual_height.__doc__ = """
+    def actual_height (self):
+        """
         To compensate for automatic sizing, actual heights of the AutoShape are
         accessed via suffixing "actual" to the function name.
         """
+        return self._height
 
-    actual_size = _actual_wrapper(Shape.size)
-    actual_size.__doc__ = """
+    def actual_size (self):
+        """
         To compensate for automatic sizing, actual sizes of the AutoShape are
         accessed via suffixing "actual" to the function name.
         """
+        return coord.Size(self._width, self._height)
 
-    normalise = _actual_wrapper(Shape.normalise)
+    def reserve (self, width, height):
+        """
+        Makes sure the canvas has room for at least ``width`` columns and
+        ``height`` rows, at least doubling its capacity when it has to grow.
+        This doesn't change the actual size of the shape.
+
+        :``width``: The number of columns required. *Required*.
+        :``height``: The number of rows required. *Required*.
+        """
+        canvas    = self._canvas
+        cap_width = 0
+        if canvas:
+            cap_width = len(canvas[0])
+        if width > cap_width:
+            cap_width = max(width, cap_width * 2)
+            for row in canvas:
+                row.extend([self.fill] * (cap_width - len(row)))
+        if height > len(canvas):
+            cap_height = max(height, len(canvas) * 2)
+            for i in xrange(cap_height - len(canvas)):
+                canvas.append([self.fill] * cap_width)
+
+    def shrink (self):
+        """
+        Removes any spare capacity from the canvas.
+        """
+        del self._canvas[self._height:]
+        for row in self._canvas:
+            del row[self._width:]
+
+    def normalise (self, width=None, height=None, fill=None):
+        """
+        Extend the actual width, height, or both, of the AutoShape. See
+        ``Shape::normalise``.
+        """
+        assert width is None or isinstance(width, int)
+        assert height is None or isinstance(height, int)
+
+        if width is not None and width < self._width:
+            raise ShapeError, "can't normalise to less than maximum width."
+
+        if height is not None and height < self._height:
+            raise ShapeError, "can't normalise to less than maximum height."
+
+        if fill is not None and len(fill) != 1:
+            raise ShapeError, "can't normalise with character '%s'." % fill
+
+        if not width:
+            width = self._width
+        if not height:
+            height = self._height
+        self.reserve(width, height)
+
+        # Spare capacity is always filled with self.fill.
+        if fill != self.fill:
+            for y in xrange(height):
+                row   = self._canvas[y]
+                start = self._width
+                if y >= self._height:
+                    start = 0
+                row[start:width] = [fill] * (width - start)
+
+        self._width  = width
+        self._height = height
+
+    def _exact (function):
+        """
+        Wraps a Shape method that works on the whole canvas, so that it is
+        called without spare capacity. Afterwards, the actual size is
+        updated from the canvas.
+
+        :``function``: The function to be wrapped.
+        """
+        def _wrapper (self, *args, **kwargs):
+            self.shrink()
+            try:
+                return function(self, *args, **kwargs)
+            finally:
+                self._max_width = None
+                self._height = len(self._canvas)
+                self._width  = Shape.width(self)
+
+        _wrapper.__name__ = function.__name__
+        _wrapper.__doc__ =  function.__doc__
+        _wrapper.__wraps__ = function
+        return _wrapper
+
+    trim    = _exact(Shape.trim)
+    pad     = _exact(Shape.pad)
+    wipe    = _exact(Shape.wipe)
+    section = _exact(Shape.section)
+    column  = _exact(Shape.column)
+    row     = _exact(Shape.row)
 
     def as_shape (self):
         """
         Attempts to convert the current AutoShape into a Shape, and then returns
         it.
         """
-        return Shape(self._canvas)
+        new_shape = Shape()
+        new_shape._canvas = [row[:self._width] for row in self._canvas[:self._height]]
+        return new_shape
+
+    def draw_on (self, shape, offset=coord.Coord(0, 0), check_conflict=True, conflict_error=False):
+        """
+        Draws ``shape`` onto this AutoShape, which is first extended as
+        necessary. See ``Shape::draw_on``.
+        """
+        if isinstance(shape, AutoShape):
+            shape = shape.as_shape()
+        if isinstance(shape, SparseShape):
+            extent = shape.height() and shape.size()
+        else:
+            extent = shape._canvas and coord.Size(max(len(row) for row in shape._canvas), len(shape._canvas))
+        if offset.x >= 0 and offset.y >= 0 and extent:
+            width  = offset.x + extent.width
+            height = offset.y + extent.height
+            if width > self._width or height > self._height:
+                self.normalise(width=max(width, self._width), height=max(height, self._height), fill=self.fill)
+        return Shape.draw_on(self, shape, offset, check_conflict, conflict_error)
+
+    def __iter__ (self):
+        """
+        Provide an iterator that returns (Coord(x, y), self[x][y]) for each
+        glyph within the actual size of the AutoShape.
+        """
+        for rownum in xrange(self._height):
+            row = self._canvas[rownum]
+            for colnum in xrange(self._width):
+                yield (coord.Coord(colnum, rownum), row[colnum])
+
+    def __str__ (self):
+        return str(self.as_shape())
 
     def __getitem__ (self, item):
         """
@@ -794,12 +975,12 @@ class AutoShape (Shape):
         :``item``: The item to be accessed.
         """
         if isinstance(item, coord.Coord):
-            if item.x >= self.actual_width():
+            if item.x >= self._width:
                 self.normalise(width=item.x+1, fill=self.fill)
-            if item.y >= self.actual_height():
+            if item.y >= self._height:
                 self.normalise(height=item.y+1, fill=self.fill)
         elif isinstance(item, int):
-            if item >= self.actual_width():
+            if item >= self._width:
                 self.normalise(width=item+1, fill=self.fill)
         return Shape.__getitem__(self, item)
 
@@ -812,9 +993,9 @@ class AutoShape (Shape):
         :``value``: The value to be set.
         """
         if isinstance(item, coord.Coord):
-            if item.x >= self.actual_width():
+            if item.x >= self._width:
                 self.normalise(width=item.x+1, fill=self.fill)
-            if item.y >= self.actual_height():
+            if item.y >= self._height:
                 self.normalise(height=item.y+1, fill=self.fill)
         return Shape.__setitem__(self, item, value)
 
@@ -933,8 +1114,533 @@ class Row (Shape):
                 nshape.append([row])
             Shape.__init__(self, nshape, width=width, fill=fill)
 
+class Composition (Shape):
+    """
+    A Shape composed of other shapes, as returned by ``adjoin``, ``underneath``
+    and ``atop`` with ``lazy=True``.
+
+    Instead of drawing its parts straight away, a composition only records
+    them (along with their offsets and conflict rules), and knows its size.
+    The first time its canvas is read, the whole tree of nested compositions
+    is drawn in one pass onto a single canvas, so that chains of joins don't
+    each allocate and redraw an intermediate canvas.
+
+    Parts are only read when the composition is drawn, so they should not be
+    modified in the meantime.
+    """
+    def __init__ (self, width, height, fill=None):
+        """
+        Create a new, empty composition.
+
+        :``width``: The width of the composed shape. *Required*.
+        :``height``: The height of the composed shape. *Required*.
+        :``fill``: The character used for the parts of the canvas that are
+                   not covered by any part. *Default None*.
+        """
+        self.fill    = fill
+        self.parts   = []
+        self._width  = width
+        self._height = height
+        self._drawn  = None
+
+    def add (self, shape, offset=coord.Coord(0, 0), check_conflict=True):
+        """
+        Add a part to the composition, to be drawn with ``Shape.draw_on``
+        after all previously added parts.
+
+        :``shape``: The shape to be drawn. *Required*.
+        :``offset``: Where to draw ``shape``. *Default 0, 0*.
+        :``check_conflict``: See ``Shape.draw_on``. *Default True*.
+        """
+        assert isinstance(shape, Shape)
+        assert coord.Size(offset)+shape.size() <= self.size()
+        if self._drawn is not None:
+            self.draw_on(shape, offset, check_conflict)
+        else:
+            self.parts.append((shape, offset, check_conflict))
+
+    def _get_canvas (self):
+        if self._drawn is None:
+            canvas = Shape(self._width, self._height, self.fill)
+            self._draw_parts(canvas, coord.Coord(0, 0))
+            self._drawn = canvas._canvas
+            self.parts  = None
+        return self._drawn
+
+    def _set_canvas (self, canvas):
+        self._drawn = canvas
+        self._max_width = None
+        self.parts  = None
+
+    _canvas = property(_get_canvas, _set_canvas)
+
+    def _draw_parts (self, canvas, offset):
+        """
+        Draw the parts of the composition onto ``canvas`` at ``offset``.
+
+        Nested compositions that haven't been drawn yet and are drawn
+        without conflict checking are painted straight onto ``canvas``;
+        everything else is drawn as usual.
+
+        :``canvas``: The Shape to draw onto. *Required*.
+        :``offset``: The co-ordinates of this composition within ``canvas``.
+                     *Required*.
+        """
+        # Walk the tree with an explicit stack, as deeply nested layouts
+        # would otherwise run into the recursion limit.
+        stack = [(iter(self.parts), offset)]
+        while stack:
+            parts, offset = stack[-1]
+            for shape, part_offset, check_conflict in parts:
+                part_offset = part_offset + offset
+                if isinstance(shape, Composition) and shape._drawn is None and not check_conflict:
+                    shape._clear(canvas, part_offset)
+                    stack.append((iter(shape.parts), part_offset))
+                    break
+                canvas.draw_on(shape, part_offset, check_conflict)
+            else:
+                stack.pop()
+
+    def _clear (self, canvas, offset):
+        """
+        Fill the area of ``canvas`` covered by this composition with its
+        fill character.
+        """
+        rows = [[self.fill] * self._width] * self._height
+        if not canvas._fits(rows, offset):
+            return canvas._draw_cells(Shape(rows), offset, False, False)
+        left  = offset.x
+        right = left + self._width
+        for y in xrange(self._height):
+            canvas._canvas[offset.y + y][left:right] = rows[y]
+
+    def width (self):
+        if self._drawn is None:
+            return self._width
+        return Shape.width(self)
+
+    def height (self):
+        if self._drawn is None:
+            return self._height
+        return Shape.height(self)
+
+    def __repr__ (self):
+        if self._drawn is None:
+            return "<Composition width=%s height=%s parts=%s>" % (self._width, self._height, len(self.parts))
+        return "<Composition width=%s height=%s>" % self.size().as_tuple()
+
+class ShapeView (object):
+    """
+    A read-only window onto a Shape, as returned by ``Shape.section`` with
+    ``view=True``. Instead of copying the glyphs, a view keeps a reference
+    to the shape's canvas, so creating one costs the same regardless of its
+    size, and changes to the shape are visible through the view.
+
+    Positions of the window that lie outside the shape, or outside an
+    optional clipping rectangle, read as ``fill``; this can be used for
+    virtual padding.
+    """
+    def __init__ (self, shape, start, size, clip_start=None, clip_stop=None, fill=None):
+        """
+        Create a new view.
+
+        :``shape``: The shape being viewed. *Required*.
+        :``start``: The co-ordinates within ``shape`` of the top left corner
+                    of the view. May be negative. *Required*.
+        :``size``: The size of the view. *Required*.
+        :``clip_start``: The top left corner of the part of ``shape`` that
+                         is visible. *Default None*.
+        :``clip_stop``: The bottom right corner of the part of ``shape`` that
+                        is visible. If both are None, all of ``shape`` is
+                        visible. *Default None*.
+        :``fill``: The glyph read outside the visible part. *Default None*.
+        """
+        self.shape      = shape
+        self.start      = coord.Coord(start)
+        self._width     = size[0]
+        self._height    = size[1]
+        self.clip_start = clip_start
+        self.clip_stop  = clip_stop
+        self.fill       = fill
+
+    def width (self):
+        return self._width
+
+    def height (self):
+        return self._height
+
+    def size (self):
+        return coord.Size(self._width, self._height)
+
+    def _bounds (self):
+        """
+        Returns the visible rectangle, in co-ordinates of the viewed shape,
+        as a (left, top, right, bottom) tuple.
+        """
+        left, top = 0, 0
+        right  = None
+        bottom = len(self.shape._canvas)
+        if self.clip_start is not None:
+            left = max(left, self.clip_start.x)
+            top  = max(top, self.clip_start.y)
+        if self.clip_stop is not None:
+            right  = self.clip_stop.x
+            bottom = min(bottom, self.clip_stop.y)
+        return left, top, right, bottom
+
+    def __getitem__ (self, item):
+        """
+        Returns the glyph at a given position of the view.
+
+        :``item``: A Coord within the view. *Required*.
+        """
+        if not isinstance(item, coord.Coord):
+            raise ShapeError, "ShapeViews only support access by Coord."
+        left, top, right, bottom = self._bounds()
+        x = self.start.x + item.x
+        y = self.start.y + item.y
+        if y < top or y >= bottom or x < left or (right is not None and x >= right):
+            return self.fill
+        row = self.shape._canvas[y]
+        if x >= len(row):
+            return self.fill
+        return row[x]
+
+    def __iter__ (self):
+        """
+        Provide an iterator that returns (Coord(x, y), glyph) for each
+        position of the view, in the same order as ``Shape.__iter__``.
+        """
+        canvas = self.shape._canvas
+        fill   = self.fill
+        left, top, right, bottom = self._bounds()
+        for y in xrange(self._height):
+            sy = self.start.y + y
+            if sy < top or sy >= bottom:
+                for x in xrange(self._width):
+                    yield (coord.Coord(x, y), fill)
+                continue
+            row  = canvas[sy]
+            stop = len(row)
+            if right is not None:
+                stop = min(stop, right)
+            for x in xrange(self._width):
+                sx = self.start.x + x
+                if sx < left or sx >= stop:
+                    yield (coord.Coord(x, y), fill)
+                else:
+                    yield (coord.Coord(x, y), row[sx])
+
+    def section (self, section_start, section_stop=None, view=True):
+        """
+        Returns a view of part of this view, sharing the same canvas.
+
+        :``section_start``: See ``Shape.section``. *Required*.
+        :``section_stop``: See ``Shape.section``. *Default None*.
+        :``view``: Ignored; sections of views are always views. *Default True*.
+        """
+        if section_stop is None:
+            section_stop = section_start
+            section_start = coord.Coord(0, 0)
+
+        assert section_start < section_stop
+
+        return ShapeView(self.shape, self.start + section_start, section_stop - section_start,
+                         self.clip_start, self.clip_stop, self.fill)
 
-def adjoin (shape1, shape2, overlap=0, top_offset=0, fill=None, join_left=False, skip_conflicts=False, collect=False, offset_both=False):
+    def as_shape (self):
+        """
+        Returns a copy of the viewed section as a new Shape.
+        """
+        new_shape = Shape(self._width, self._height, self.fill)
+        for xy, glyph in self:
+            new_shape[xy] = glyph
+        return new_shape
+
+    def __len__ (self):
+        return self._width
+
+    def __repr__ (self):
+        return "<ShapeView width=%s height=%s at %s>" % (self._width, self._height, self.start)
+
+    def __str__ (self):
+        return str(self.as_shape())
+
+class SparseShape (object):
+    """
+    A Shape that only stores the glyphs that aren't None.
+
+    Each row is kept as a sorted list of runs of consecutive glyphs, so that
+    mostly empty canvases (such as manors with courtyards) take up space
+    and iteration time in proportion to what has actually been drawn. The
+    length of each row is remembered separately, so converting a Shape to
+    a SparseShape and back results in an identical Shape.
+
+    Empty space in a SparseShape is transparent: drawing it onto another
+    shape never overwrites anything with None.
+    """
+    def __init__ (self, shape=None, width=0, height=0):
+        """
+        Create a new sparse shape.
+
+        :``shape``: A Shape (or AutoShape, ShapeView or Composition) whose
+                    glyphs should be copied. *Default None*.
+        :``width``: If ``shape`` is not provided, the width of the empty
+                    sparse shape. *Default 0*.
+        :``height``: Likewise with ``width``. *Default 0*.
+        """
+        self._starts  = []
+        self._runs    = []
+        self._lengths = []
+
+        if shape is None:
+            for y in xrange(height):
+                self._starts.append([])
+                self._runs.append([])
+                self._lengths.append(width)
+            return
+
+        if isinstance(shape, SparseShape):
+            for y in xrange(shape.height()):
+                self._starts.append(shape._starts[y][:])
+                self._runs.append([run[:] for run in shape._runs[y]])
+            self._lengths = shape._lengths[:]
+            return
+
+        if isinstance(shape, AutoShape) or isinstance(shape, ShapeView):
+            shape = shape.as_shape()
+
+        for row in shape._canvas:
+            starts, runs = [], []
+            run = None
+            for x, glyph in enumerate(row):
+                if glyph is None:
+                    run = None
+                elif run is None:
+                    run = [glyph]
+                    starts.append(x)
+                    runs.append(run)
+                else:
+                    run.append(glyph)
+            self._starts.append(starts)
+            self._runs.append(runs)
+            self._lengths.append(len(row))
+
+    def width (self):
+        """
+        Returns the length of the longest row, as with ``Shape::width``.
+        """
+        if not self._lengths:
+            return 0
+        return max(self._lengths)
+
+    def height (self):
+        return len(self._lengths)
+
+    def size (self):
+        return coord.Size(self.width(), self.height())
+
+    def spans (self):
+        """
+        Provide an iterator that returns (Coord(x, y), glyphs) for each run
+        of consecutive glyphs that aren't None, row by row.
+        """
+        for y in xrange(len(self._lengths)):
+            for x, run in zip(self._starts[y], self._runs[y]):
+                yield (coord.Coord(x, y), run)
+
+    def __iter__ (self):
+        """
+        Provide an iterator that returns (Coord(x, y), glyph) for each glyph
+        that isn't None, in the same order as ``Shape.__iter__``.
+        """
+        for y in xrange(len(self._lengths)):
+            for x, run in zip(self._starts[y], self._runs[y]):
+                for i, glyph in enumerate(run):
+                    yield (coord.Coord(x + i, y), glyph)
+
+    def __getitem__ (self, item):
+        """
+        Returns the glyph at a given position, or None if nothing has been
+        drawn there.
+
+        :``item``: A Coord within the shape. *Required*.
+        """
+        if not isinstance(item, coord.Coord):
+            raise ShapeError, "SparseShapes only support access by Coord."
+        if item.x < 0 or item.x >= self._lengths[item.y]:
+            raise IndexError, "%s is outside of the shape." % item
+        starts = self._starts[item.y]
+        i = bisect.bisect_right(starts, item.x) - 1
+        if i >= 0:
+            run = self._runs[item.y][i]
+            if item.x < starts[i] + len(run):
+                return run[item.x - starts[i]]
+        return None
+
+    def __setitem__ (self, item, value):
+        """
+        Replaces the glyph at a given position.
+
+        :``item``: A Coord within the shape. *Required*.
+        :``value``: Either None or a single character string. *Required*.
+        """
+        if not isinstance(item, coord.Coord):
+            raise ShapeError, "SparseShapes only support access by Coord."
+        if item.x < 0 or item.x >= self._lengths[item.y]:
+            raise IndexError, "%s is outside of the shape." % item
+        self._write(item.y, item.x, [value])
+
+    def _clear (self, y, left, right):
+        """
+        Remove all glyphs from row ``y`` between columns ``left`` and
+        ``right`` (exclusive), splitting runs where necessary.
+        """
+        starts, runs = self._starts[y], self._runs[y]
+        lo = max(bisect.bisect_right(starts, left) - 1, 0)
+        hi = bisect.bisect_left(starts, right)
+        new_starts, new_runs = [], []
+        for i in xrange(lo, hi):
+            start, run = starts[i], runs[i]
+            stop = start + len(run)
+            if stop <= left:
+                new_starts.append(start)
+                new_runs.append(run)
+                continue
+            if start < left:
+                new_starts.append(start)
+                new_runs.append(run[:left - start])
+            if stop > right:
+                new_starts.append(right)
+                new_runs.append(run[right - start:])
+        starts[lo:hi] = new_starts
+        runs[lo:hi] = new_runs
+
+    def _put (self, y, x, run):
+        """
+        Insert a run of glyphs that aren't None into row ``y`` at column
+        ``x``, replacing anything there and merging with neighbouring runs.
+        """
+        self._clear(y, x, x + len(run))
+        starts, runs = self._starts[y], self._runs[y]
+        i = bisect.bisect_left(starts, x)
+        run = list(run)
+        if i < len(starts) and starts[i] == x + len(run):
+            run.extend(runs[i])
+            del starts[i], runs[i]
+        if i > 0 and starts[i-1] + len(runs[i-1]) == x:
+            runs[i-1].extend(run)
+        else:
+            starts.insert(i, x)
+            runs.insert(i, run)
+
+    def _write (self, y, x, glyphs, transparent=False):
+        """
+        Write a list of glyphs to row ``y`` from column ``x`` onwards.
+
+        :``transparent``: If true, None glyphs leave the existing glyphs
+                          alone; otherwise, they erase them. *Default False*.
+        """
+        if not transparent:
+            self._clear(y, x, x + len(glyphs))
+        start = None
+        for i, glyph in enumerate(glyphs):
+            if glyph is None:
+                if start is not None:
+                    self._put(y, x + start, glyphs[start:i])
+                    start = None
+            elif start is None:
+                start = i
+        if start is not None:
+            self._put(y, x + start, glyphs[start:])
+
+    def _gaps (self, y, left, right):
+        """
+        Returns a list of (left, right) pairs for the empty stretches of row
+        ``y`` between columns ``left`` and ``right`` (exclusive).
+        """
+        starts, runs = self._starts[y], self._runs[y]
+        gaps = []
+        i = max(bisect.bisect_right(starts, left) - 1, 0)
+        while left < right:
+            if i >= len(starts) or starts[i] >= right:
+                gaps.append((left, right))
+                break
+            start, stop = starts[i], starts[i] + len(runs[i])
+            if start > left:
+                gaps.append((left, start))
+            left = max(left, stop)
+            i += 1
+        return gaps
+
+    def draw_on (self, shape, offset=coord.Coord(0, 0), check_conflict=True, conflict_error=False):
+        """
+        Draw ``shape`` on top of this sparse shape, with the same meaning as
+        ``Shape::draw_on``. If ``shape`` is a SparseShape, only its runs are
+        visited; otherwise None glyphs of ``shape`` erase those underneath
+        unless ``check_conflict`` is true.
+
+        :``shape``: The Shape or SparseShape to draw. *Required*.
+        :``offset``: Where to draw ``shape``. *Default 0, 0*.
+        :``check_conflict``: Only draw onto positions that are None. *Default
+                             True*.
+        :``conflict_error``: Raise a ShapeError upon conflicts. *Default
+                             False*.
+        """
+        if isinstance(shape, SparseShape):
+            rows = shape.spans()
+            transparent = True
+        else:
+            if isinstance(shape, AutoShape) or isinstance(shape, ShapeView):
+                shape = shape.as_shape()
+            rows = ((coord.Coord(0, y), row) for y, row in enumerate(shape._canvas))
+            transparent = check_conflict
+
+        for pos, glyphs in rows:
+            x = pos.x + offset.x
+            y = pos.y + offset.y
+            if x < 0 or y < 0 or x + len(glyphs) > self._lengths[y]:
+                raise IndexError, "Cannot draw %s glyphs at %s." % (len(glyphs), coord.Coord(x, y))
+            if not check_conflict:
+                self._write(y, x, glyphs, transparent)
+                continue
+            gaps = self._gaps(y, x, x + len(glyphs))
+            if conflict_error and sum(right - left for left, right in gaps) < len(glyphs):
+                free = set()
+                for left, right in gaps:
+                    free.update(xrange(left, right))
+                for i, glyph in enumerate(glyphs):
+                    if x + i not in free:
+                        raise ShapeError, "Tried to blit foreign '%s' onto '%s' at %s!" % (glyph, self[coord.Coord(x + i, y)], coord.Coord(x + i, y))
+            for left, right in gaps:
+                self._write(y, left, glyphs[left - x:right - x], True)
+
+    def as_shape (self):
+        """
+        Returns an equivalent dense Shape.
+        """
+        new_shape = Shape()
+        canvas = new_shape._canvas
+        for y, length in enumerate(self._lengths):
+            row = [None] * length
+            for x, run in zip(self._starts[y], self._runs[y]):
+                row[x:x + len(run)] = run
+            canvas.append(row)
+        return new_shape
+
+    def copy (self):
+        return SparseShape(self)
+
+    def __len__ (self):
+        return self.width()
+
+    def __repr__ (self):
+        return "<SparseShape width=%s height=%s>" % self.size().as_tuple()
+
+    def __str__ (self):
+        return str(self.as_shape())
+
+def adjoin (shape1, shape2, overlap=0, top_offset=0, fill=None, join_left=False, skip_conflicts=False, collect=False, offset_both=False, lazy=False):
     """
     Take two shapes and combine them into one. This method places shapes
     side-by-side with ``shape1`` on the left and ``shape2`` on the right. If
@@ -960,6 +1666,8 @@ def adjoin (shape1, shape2, overlap=0, top_offset=0, fill=None, join_left=False,
                      *Default False*.
     :``offset_both``: If true, the ``top_offset`` will be applied to both
                       shapes. *Default False*.
+    :``lazy``: If true, and not collecting, returns a Composition that is
+               only drawn once its canvas is needed. *Default False*.
     """
     cl_class = collection.ShapeCollection
 
@@ -978,8 +1686,7 @@ def adjoin (shape1, shape2, overlap=0, top_offset=0, fill=None, join_left=False,
 
     new_size = coord.Size(width=shape1.width()+shape2.width()-overlap, height=max(shape1.height(), shape2.height()))
 
-    new_canvas = Shape(width=new_size.width, height=new_size.height, fill=fill)
-
+    first_offset = coord.Coord(0, 0)
     if offset_both:
         first_offset = coord.Coord(0, top_offset)
 
@@ -1002,11 +1709,17 @@ def adjoin (shape1, shape2, overlap=0, top_offset=0, fill=None, join_left=False,
             collect.append(collection.ShapeCoord(shape2, coord.Coord(shape1.width()-overlap, top_offset)))
         return collect
     else:
-        new_canvas.draw_on(shape1, offset=first_offset, check_conflict=skip_conflicts)
-        new_canvas.draw_on(shape2, offset=coord.Coord(shape1.width()-overlap, top_offset), check_conflict=skip_conflicts)
+        if lazy:
+            new_canvas = Composition(new_size.width, new_size.height, fill)
+            draw = new_canvas.add
+        else:
+            new_canvas = Shape(width=new_size.width, height=new_size.height, fill=fill)
+            draw = new_canvas.draw_on
+        draw(shape1, first_offset, skip_conflicts)
+        draw(shape2, coord.Coord(shape1.width()-overlap, top_offset), skip_conflicts)
         return new_canvas
 
-def underneath (shape1, shape2, left_offset=0, overlap=0, fill=None, join_top=False, skip_conflicts=False, offset_first=False, offset_second=True, collect=False):
+def underneath (shape1, shape2, left_offset=0, overlap=0, fill=None, join_top=False, skip_conflicts=False, offset_first=False, offset_second=True, collect=False, lazy=False):
     """
     Take two shapes and combine them into one by drawing ``shape1`` and then
     drawing ``shape2`` directly beneath it.
@@ -1027,6 +1740,8 @@ def underneath (shape1, shape2, left_offset=0, overlap=0, fill=None, join_top=Fa
     :``offset_second``: Offset ``shape2`` by ``left_offset``. *Default True*.
     :``collect``: If true, returns a ShapeCollection instead of a canvas.
                      *Default False*.
+    :``lazy``: If true, and not collecting, returns a Composition that is
+               only drawn once its canvas is needed. *Default False*.
     """
     cl_class = collection.ShapeCollection
 
@@ -1045,21 +1760,20 @@ def underneath (shape1, shape2, left_offset=0, overlap=0, fill=None, join_top=Fa
         shape1 = s1
 
     new_size = coord.Size(width=max(shape1.width()+left_offset, shape2.width()+left_offset), height=shape1.height()+shape2.height())
-    new_canvas = Shape(width=new_size.width, height=new_size.height-overlap, fill=fill)
     shape1_offset = coord.Coord(0, 0)
     shape2_offset = coord.Coord(0, shape1.height()-overlap)
     if offset_first:
         shape1_offset = coord.Coord(left_offset, 0)
     if offset_second:
-        shape2_offset.x = left_offset
+        shape2_offset = coord.Coord(left_offset, shape2_offset.y)
     if collect:
         if isinstance(shape1, collection.ShapeCollection):
             collect = shape1.copy()
         else:
             collect = cl_class()
             if collect.height() > 0:
-                shape1_offset.y += collect.height()
-                shape2_offset.y += collect.height()
+                shape1_offset += coord.Coord(0, collect.height())
+                shape2_offset += coord.Coord(0, collect.height())
             collect.append(collection.ShapeCoord(shape1, shape1_offset))
 
         if isinstance(shape2, collection.ShapeCollection):
@@ -1069,11 +1783,17 @@ def underneath (shape1, shape2, left_offset=0, overlap=0, fill=None, join_top=Fa
             collect.append(collection.ShapeCoord(shape2, shape2_offset))
         return collect
     else:
-        new_canvas.draw_on(shape1, shape1_offset)
-        new_canvas.draw_on(shape2, shape2_offset, skip_conflicts)
+        if lazy:
+            new_canvas = Composition(new_size.width, new_size.height-overlap, fill)
+            draw = new_canvas.add
+        else:
+            new_canvas = Shape(width=new_size.width, height=new_size.height-overlap, fill=fill)
+            draw = new_canvas.draw_on
+        draw(shape1, shape1_offset)
+        draw(shape2, shape2_offset, skip_conflicts)
         return new_canvas
 
-def atop (shape1, shape2, left_offset=0, overlap=0, fill=None, join_bottom=False, skip_conflicts=False, offset_first=False, offset_second=True, collect=False):
+def atop (shape1, shape2, left_offset=0, overlap=0, fill=None, join_bottom=False, skip_conflicts=False, offset_first=False, offset_second=True, collect=False, lazy=False):
     """
     Take two shapes and combine them into one by drawing ``shape1`` and then
     drawing ``shape2`` directly above it. This is an alias for ``underneath``
@@ -1095,5 +1815,7 @@ def atop (shape1, shape2, left_offset=0, overlap=0, fill=None, join_bottom=False
     :``offset_second``: Offset ``shape2`` by ``left_offset``. *Default True*.
     :``collect``: If true, returns a ShapeCollection instead of a canvas.
                      *Default False*.
+    :``lazy``: If true, and not collecting, returns a Composition that is
+               only drawn once its canvas is needed. *Default False*.
     """
-    return underneath(shape1, shape2, left_offset, overlap, fill, not join_bottom, skip_conflicts, offset_first, offset_second, collect)
+    return underneath(shape1, shape2, left_offset, overlap, fill, not join_bottom, skip_conflicts, offset_first, offset_second, collect, lazy)
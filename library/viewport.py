@@ -1,5 +1,5 @@
 #!/usr/bin/env python
-from library import coord
+from library import coord, shape
 
 class ViewPort (object):
     """
@@ -51,45 +51,31 @@ class ViewPort (object):
             self._top = stop.y - self._height
 
     def sect (self):
+        """
+        Returns a read-only view of the currently visible part of the buffer.
+        Parts of the viewport beyond the edges of the buffer are padded with
+        None.
+        """
         width  = self._width
         height = self._height
 
-        left_padding = False
-        top_padding  = False
-
         left = self._left
         top  = self._top
 
-        start = coord.Coord(left, top)
-        stop  = coord.Coord(left + width, top + height)
-
         bwidth, bheight = self.buffer.size()
 
-        if start.x < 0:
-            left_padding = True
-            start.x = 0
-        if start.y < 0:
-            top_padding = True
-            start.y = 0
-        if stop.x > bwidth:
-            stop.x = bwidth
-        if stop.y > bheight:
-            stop.y = bheight
-
-        sect = self.buffer.section(start, stop)
-
-        if sect.width() < width:
-            if left_padding:
-                sect.pad(num_cols=width)
-            else:
-                sect.normalise(width=width)
-        if sect.height() < height:
-            if top_padding:
-                sect.pad(num_rows=height)
-            else:
-                sect.normalise(height=height)
-
-        return sect
+        # The visible part of the buffer.
+        start = coord.Coord(max(left, 0), max(top, 0))
+        stop  = coord.Coord(min(left + width, bwidth), min(top + height, bheight))
+
+        # If the buffer is smaller than the viewport and we scrolled past
+        # its left or top edge, it's aligned with the right or bottom edge.
+        if left < 0 and stop.x - start.x < width:
+            left = stop.x - width
+        if top < 0 and stop.y - start.y < height:
+            top = stop.y - height
+
+        return shape.ShapeView(self.buffer, coord.Coord(left, top), (width, height), start, stop)
 
     def pos_in_section (self, pos):
         if (pos.x <= self._left or pos.x >= self._left + self._width
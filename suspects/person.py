@@ -385,6 +385,8 @@ class SuspectList (object):
         :``max_suspects``: The maximum number of suspects. *Required*.
         :``rooms``: List of room names. Required for calculating alibis. *Default none*.
         """
+        self.suspects = []
+
         # Define function shortcut for speed-up.
         sappend  = self.suspects.append
 
@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+"""
+Checks that lazily composed shapes (``lazy=True``) look the same as shapes
+composed straight away, for random trees of ``adjoin``, ``underneath`` and
+``atop``.
+"""
+
+import random
+from library import coord, shape
+
+def random_shape (rng):
+    """
+    Returns a small shape with a random fill and a few random glyphs.
+
+    :``rng``: A random.Random instance. *Required*.
+    """
+    width  = rng.randint(1, 5)
+    height = rng.randint(1, 5)
+    s = shape.Shape(width, height, rng.choice([None, '.', '#']))
+    for i in xrange(rng.randint(0, 4)):
+        s[coord.Coord(rng.randrange(width), rng.randrange(height))] = rng.choice([None, 'x', 'y'])
+    return s
+
+def compose (depth, lazy, rng):
+    """
+    Returns a random tree of joined shapes. Called with random generators
+    in the same state, it composes the same shapes in the same way.
+
+    :``depth``: The maximum depth of the tree. *Required*.
+    :``lazy``: Passed on to ``adjoin``, ``underneath`` and ``atop``. *Required*.
+    :``rng``: A random.Random instance. *Required*.
+    """
+    if depth == 0 or rng.random() < 0.2:
+        return random_shape(rng)
+    shape1 = compose(depth - 1, lazy, rng)
+    shape2 = compose(depth - 1, lazy, rng)
+
+    op      = rng.choice(['adjoin', 'underneath', 'atop'])
+    fill    = rng.choice([None, '.'])
+    skip    = rng.random() < 0.5
+    overlap = rng.randint(0, 1)
+    if op == 'adjoin':
+        # adjoin doesn't make room for an offset that moves a shape below
+        # the taller one, so only the shorter right-hand shape is offset.
+        join_left   = rng.random() < 0.3
+        offset_both = rng.random() < 0.3
+        left, right = shape1, shape2
+        if join_left:
+            left, right = shape2, shape1
+        top_offset = 0
+        if not offset_both:
+            top_offset = rng.randint(0, max(0, left.height() - right.height()))
+        return shape.adjoin(shape1, shape2, overlap=overlap, top_offset=top_offset,
+                            fill=fill, skip_conflicts=skip, join_left=join_left,
+                            offset_both=offset_both, lazy=lazy)
+    join = getattr(shape, op)
+    return join(shape1, shape2, left_offset=rng.randint(0, 2), overlap=overlap, fill=fill,
+                skip_conflicts=skip, offset_first=rng.random() < 0.3, lazy=lazy)
+
+def glyphs (s):
+    """
+    Returns a list of all glyphs of a shape, row by row.
+
+    :``s``: A Shape. *Required*.
+    """
+    size = s.size()
+    return [s[coord.Coord(x, y)] for y in xrange(size.y) for x in xrange(size.x)]
+
+if __name__=="__main__":
+    right = wrong = 0
+    for seed in xrange(1000):
+        eager = compose(5, False, random.Random(seed))
+        lazy  = compose(5, True, random.Random(seed))
+        if lazy.size() == eager.size() and glyphs(lazy) == glyphs(eager):
+            right += 1
+        else:
+            print "Composition %s differs:\n%s\n\n%s" % (seed, eager, lazy)
+            wrong += 1
+
+    print "counter right: %s" % right
+    print "counter wrong: %s" % wrong
+    if wrong == 0:
+        print "The composition test was successful."
+    else:
+        print "There were errors in the composition test."
@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+"""
+Checks that SparseShapes behave like the corresponding dense Shapes: reading
+and writing glyphs, drawing onto them and combining collections, as well as
+converting ragged and normalised shapes back and forth.
+"""
+
+import random
+from library import shape, collection
+from library.coord import Coord
+
+class SparseShapeTest (object):
+    """
+    A unit test comparing SparseShape with Shape.
+    """
+    def __init__ (self, count=1000):
+        """
+        Runs all checks on a number of random shapes.
+
+        :``count``: The number of random shapes per check. *Default 1000*.
+        """
+        self.counter_wrong = 0
+        self.counter_right = 0
+        random.seed(5)
+        for i in xrange(count):
+            self.convert_test()
+            self.normalise_test()
+            self.get_set_test()
+            self.draw_on_test()
+        for i in xrange(count / 5):
+            self.combine_test()
+
+    def evaluate (self):
+        """
+        Compares the counters for correct and incorrect results and outputs
+        the results.
+        """
+        print "counter right: %s" % self.counter_right
+        print "counter wrong: %s" % self.counter_wrong
+        return self.counter_wrong == 0
+
+    def check (self, name, sparse, dense):
+        """
+        Compares a SparseShape with a Shape, row by row, including the
+        lengths of the rows.
+
+        :``name``: The name of the check, for the output. *Required*.
+        :``sparse``: A SparseShape. *Required*.
+        :``dense``: A Shape. *Required*.
+        """
+        if sparse.as_shape()._canvas == dense._canvas:
+            self.counter_right += 1
+        else:
+            print "%s: expected\n%s\ngot\n%s" % (name, dense, sparse)
+            self.counter_wrong += 1
+
+    def random_shape (self, width, height, ragged=False):
+        """
+        Returns a Shape with some random glyphs, and empty space elsewhere.
+
+        :``width``: The width of the shape. *Required*.
+        :``height``: The height of the shape. *Required*.
+        :``ragged``: If true, some rows may be shorter than the others. *Default False*.
+        """
+        s = shape.Shape(width, height)
+        density = random.random()
+        for y in xrange(height):
+            for x in xrange(width):
+                if random.random() < density:
+                    s[Coord(x, y)] = random.choice('abc')
+        if ragged and height > 0 and width > 0:
+            y = random.randrange(height)
+            s._canvas[y] = s._canvas[y][:random.randrange(width)]
+            s._max_width = None
+        return s
+
+    def convert_test (self):
+        """
+        Converts a ragged Shape to a SparseShape and back, and checks that
+        iterating over both yields the same glyphs.
+        """
+        dense  = self.random_shape(random.randint(0, 8), random.randint(0, 8), True)
+        sparse = shape.SparseShape(dense)
+        self.check("conversion", sparse, dense)
+        if [c for c in dense if c[1] is not None] == list(sparse):
+            self.counter_right += 1
+        else:
+            print "iteration: expected %s, got %s" % ([c for c in dense if c[1] is not None], list(sparse))
+            self.counter_wrong += 1
+
+    def normalise_test (self):
+        """
+        Normalises a ragged Shape and checks that it survives converting to
+        a SparseShape and back, both before and after normalising.
+        """
+        dense = self.random_shape(random.randint(1, 8), random.randint(1, 8), True)
+        self.check("ragged round trip", shape.SparseShape(dense), dense)
+        dense.normalise(dense.width() + random.randint(0, 2), dense.height() + random.randint(0, 2))
+        self.check("normalised round trip", shape.SparseShape(dense), dense)
+
+    def get_set_test (self):
+        """
+        Reads and writes random positions of both kinds of shape.
+        """
+        width  = random.randint(1, 8)
+        height = random.randint(1, 8)
+        dense  = self.random_shape(width, height)
+        sparse = shape.SparseShape(dense)
+        for i in xrange(5):
+            pos = Coord(random.randrange(width), random.randrange(height))
+            if sparse[pos] == dense[pos]:
+                self.counter_right += 1
+            else:
+                print "get %s: expected %r, got %r" % (pos, dense[pos], sparse[pos])
+                self.counter_wrong += 1
+            glyph = random.choice([None, 'z'])
+            dense[pos]  = glyph
+            sparse[pos] = glyph
+        self.check("set", sparse, dense)
+
+    def draw_on_test (self):
+        """
+        Draws a random shape onto both kinds of shape, with and without
+        conflict checking. The drawn shape is either dense or sparse. With
+        conflict checking, both should give the same result; without it,
+        the empty space of a SparseShape is transparent, so drawing it is
+        compared to only drawing its glyphs.
+        """
+        width  = random.randint(1, 8)
+        height = random.randint(1, 8)
+        base   = self.random_shape(width, height)
+        src    = self.random_shape(random.randint(1, width), random.randint(1, height))
+        offset = Coord(random.randint(0, width - src.width()), random.randint(0, height - src.height()))
+        check_conflict = random.random() < 0.5
+
+        for sparse_src in (False, True):
+            dense  = shape.Shape(base)
+            sparse = shape.SparseShape(base)
+            drawn  = src
+            if sparse_src:
+                drawn = shape.SparseShape(src)
+            if sparse_src and not check_conflict:
+                for pos, glyph in src:
+                    if glyph is not None:
+                        dense[pos + offset] = glyph
+            else:
+                dense.draw_on(src, offset, check_conflict)
+            sparse.draw_on(drawn, offset, check_conflict)
+            self.check("draw_on", sparse, dense)
+
+            if sparse_src:
+                other = shape.Shape(base)
+                other.draw_on(drawn, offset, check_conflict)
+                if other._canvas == dense._canvas:
+                    self.counter_right += 1
+                else:
+                    print "draw_on from sparse: expected\n%s\ngot\n%s" % (dense, other)
+                    self.counter_wrong += 1
+
+    def combine_test (self):
+        """
+        Combines a collection of random shapes into both kinds of shape.
+        """
+        c = collection.ShapeCollection()
+        for i in xrange(random.randint(1, 6)):
+            c.append(self.random_shape(random.randint(1, 5), random.randint(1, 5)),
+                     Coord(random.randint(0, 6), random.randint(0, 6)))
+        self.check("combine", c.combine(sparse=True), c.combine())
+
+if __name__ == "__main__":
+    if SparseShapeTest().evaluate():
+        print "The sparse shape test was successful."
+    else:
+        print "There were errors in the sparse shape test."
@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+"""
+Checks that coordinates and sizes survive being pickled and copied.
+"""
+
+import copy, pickle
+from library.coord import *
+
+def round_trip (value):
+    """
+    Pickles and copies a value with each protocol and returns whether all
+    of the results are equal to the original and of the same class.
+
+    :``value``: A Coord, Size or similar. *Required*.
+    """
+    results = [copy.copy(value), copy.deepcopy(value)]
+    for protocol in xrange(pickle.HIGHEST_PROTOCOL + 1):
+        results.append(pickle.loads(pickle.dumps(value, protocol)))
+
+    success = True
+    for result in results:
+        if result.__class__ is not value.__class__:
+            print "%r became %r." % (value, result)
+            success = False
+        elif isinstance(value, AutoSize):
+            # Automatic sizes are never equal to anything.
+            if not isinstance(result.width, AutoDimension) or not isinstance(result.height, AutoDimension):
+                print "%r became %r." % (value, result)
+                success = False
+        elif result.as_tuple() != value.as_tuple():
+            print "%r became %r." % (value, result)
+            success = False
+    return success
+
+if __name__ == "__main__":
+    values = [Coord(3, 4), Coord(500, -1), MutableCoord(3, 4), Size(10, 20), AutoSize()]
+    failures = 0
+    for value in values:
+        if not round_trip(value):
+            failures += 1
+    if failures == 0:
+        print "All coordinates survived pickling and copying."
+    else:
+        print "%s of %s coordinates didn't survive pickling and copying." % (failures, len(values))
@@ -55,8 +55,8 @@ def main ():
                                    height=min(mymanor.size().height, 20))
 
     # Initialise a couple of variables.
-    ppos      = library.coord.Coord(35, 10) # player (@) position in the viewport
-    last_move = library.coord.Coord(0, 0) # the last step taken by the player
+    ppos      = library.coord.MutableCoord(35, 10) # player (@) position in the viewport
+    last_move = library.coord.MutableCoord(0, 0) # the last step taken by the player
     placement        = True  # initial player placement
     move_was_blocked = False # tried to leave the manor boundaries
     did_move         = True  # actually took a step
@@ -124,7 +124,7 @@ def main ():
         # Otherwise, take a step unless it would make us leave the manor.
 
         # Reinitialise the relevant variables.
-        last_move        = library.coord.Coord(0, 0)
+        last_move        = library.coord.MutableCoord(0, 0)
         move_was_blocked = False
         did_move         = True
         if ch == curses.KEY_UP:
@@ -168,7 +168,7 @@ def main ():
 
         if move_was_blocked:
             # Reset last_move.
-            last_move = library.coord.Coord(0, 0)
+            last_move = library.coord.MutableCoord(0, 0)
             did_move = False
 
     screen.deinit()
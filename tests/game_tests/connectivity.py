@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+"""
+Compares the articulation point index of the rooms of furnished manors
+against a brute-force flood fill, before and after changing some features.
+"""
+
+import random, sys, os
+from builder import builder, manor
+from library import coord
+from interface.features import *
+
+class ConnectivityTest (object):
+    """
+    A unit test for ``ManorCollection.pos_blocks_corridor``.
+    """
+    def __init__ (self, seeds=10):
+        """
+        Generates a couple of manors and checks each position of every room.
+
+        :``seeds``: The number of manors to check. *Default 10*.
+        """
+        self.counter_wrong = 0
+        self.counter_right = 0
+        for seed in xrange(seeds):
+            random.seed(seed)
+            self.m = manor.ManorCollection(builder.builder_by_type(None))
+            self.m.add_features()
+            self.check_rooms()
+            # Block or clear some positions, then check again, so that the
+            # indices have to be recomputed.
+            size = self.m.size()
+            for i in xrange(50):
+                pos = coord.Coord(random.randint(1, size.x - 2), random.randint(1, size.y - 2))
+                if self.m.get_room_index(pos) == None:
+                    continue
+                self.m.set_feature(pos, random.choice((FLOOR, WALL)))
+            self.check_rooms()
+
+    def evaluate (self):
+        """
+        Compares the counters for correct and incorrect results and outputs
+        the results.
+        """
+        print "counter right: %s" % self.counter_right
+        print "counter wrong: %s" % self.counter_wrong
+        return self.counter_wrong == 0
+
+    def count_components (self, cells):
+        """
+        Returns the number of connected parts of a set of cells, by flood
+        filling from each cell that hasn't been reached yet.
+
+        :``cells``: A set of traversable cell indices. *Required*.
+        """
+        width = self.m.size().x
+        seen  = set()
+        count = 0
+        for start in cells:
+            if start in seen:
+                continue
+            count += 1
+            seen.add(start)
+            todo = [start]
+            while todo:
+                curr = todo.pop()
+                for n in (curr - 1, curr + 1, curr - width, curr + width):
+                    if n in cells and n not in seen:
+                        seen.add(n)
+                        todo.append(n)
+        return count
+
+    def flood_fill_blocks (self, cells, idx):
+        """
+        Returns whether blocking a cell splits the other traversable cells
+        of a room into more disconnected parts than before.
+
+        :``cells``: The set of traversable cell indices of the room. *Required*.
+        :``idx``: The index of the cell to block. *Required*.
+        """
+        if idx not in cells:
+            return False
+        return self.count_components(cells - set([idx])) > self.count_components(cells)
+
+    def check_rooms (self):
+        """
+        Checks each position of every room of the current manor.
+        """
+        m      = self.m
+        width  = m.size().x
+        labels = m.get_room_labels()
+        for r in m.rooms:
+            cells = set()
+            for idx in xrange(len(labels)):
+                if labels[idx] == r and m.features.traversable(coord.Coord(idx % width, idx / width)):
+                    cells.add(idx)
+            for idx in xrange(len(labels)):
+                if labels[idx] != r:
+                    continue
+                pos = coord.Coord(idx % width, idx / width)
+                if m.pos_blocks_corridor(pos) == self.flood_fill_blocks(cells, idx):
+                    self.counter_right += 1
+                else:
+                    print >> sys.stderr, "Wrong result for %s in room %s." % (pos, r)
+                    self.counter_wrong += 1
+
+if __name__ == "__main__":
+    # The builders are quite talkative.
+    stdout = sys.stdout
+    sys.stdout = open(os.devnull, "w")
+    test = ConnectivityTest()
+    sys.stdout = stdout
+    if test.evaluate():
+        print "The connectivity test was successful."
+    else:
+        print "There were errors in the connectivity test."
@@ -14,6 +14,10 @@ class PathfindTest (object):
         """
         self.init_fgrid()
         self.fgrid.draw()
+        # Split the grid into a left and a right region for the
+        # hierarchical planner.
+        self.labels  = [i % 10 / 5 for i in xrange(100)]
+        self.planner = pathfind.HierarchicalPathfind(self.fgrid, self.labels)
         self.counter_wrong = 0
         self.counter_right = 0
 
@@ -25,12 +29,21 @@ class PathfindTest (object):
         self.pathfind_test(A, A, True)
         self.pathfind_test(A, B, False)
         self.pathfind_test(B, A, False)
-        self.pathfind_test(B, D, True)
-        self.pathfind_test(D, B, True)
+        self.pathfind_test(B, D, True, 8)
+        self.pathfind_test(D, B, True, 8)
         self.pathfind_test(B, C, False)
         self.pathfind_test(C, B, False)
-        self.pathfind_test(D, E, True)
-        self.pathfind_test(E, D, True)
+        self.pathfind_test(D, E, True, 23)
+        self.pathfind_test(E, D, True, 23)
+
+        # A wall as goal, requested once and by several agents.
+        W = coord.Coord(3,2)
+        self.plan_paths_test([(B, W)], [None])
+        self.plan_paths_test([(B, W), (D, W)], [None, None])
+        # A shared goal is only reachable by some of the agents.
+        self.plan_paths_test([(B, D), (E, D), (A, D)], [8, 23, None])
+        self.plan_paths_test([(B, "room")], KeyError)
+        self.plan_paths_test([(B, "room"), (D, "room")], KeyError)
 
     def evaluate (self):
         """
@@ -75,7 +88,7 @@ class PathfindTest (object):
             self.fgrid.__setitem__(pos, WALL)
         self.fgrid.__setitem__(coord.Coord(1,8), FLOOR)
 
-    def pathfind_test (self, start, stop, expected):
+    def pathfind_test (self, start, stop, expected, expected_length=None):
         """
         Checks whether there's a path from start to stop in fgrid, and
         compares the result with the expected result handed in.
@@ -83,11 +96,25 @@ class PathfindTest (object):
         :``start``: The starting position within the grid. *Required*.
         :``stop``: The path's target position within the grid. *Required*.
         :``expected``: Whether we expect the pathfinding to be successful or not. *Required*.
+        :``expected_length``: The number of coordinates on the shortest path,
+                   including start and stop. If None, the length isn't
+                   checked. *Default None*.
         """
         result = pathfind.Pathfind(self.fgrid, start, stop).path_exists()
         if result:
             print "A path between %s and %s exists." % (start, stop)
-            print pathfind.Pathfind(self.fgrid, start, stop).get_path()
+            path = pathfind.Pathfind(self.fgrid, start, stop).get_path()
+            print path
+            if expected_length != None and len(path) != expected_length:
+                print "Expected a path of length %s, got %s." % (expected_length, len(path))
+                result = not expected
+            hpath = self.planner.get_path(start, stop)
+            if hpath == None or len(hpath) != len(path):
+                print "Hierarchical path differs: %s" % hpath
+                result = not expected
+        elif self.planner.get_path(start, stop) != None:
+            print "Hierarchical planner found a path between %s and %s." % (start, stop)
+            result = not expected
         else:
             print "A path between %s and %s could not be found." % (start, stop)
 
@@ -96,6 +123,30 @@ class PathfindTest (object):
         else:
             self.counter_wrong += 1
 
+    def plan_paths_test (self, requests, expected):
+        """
+        Plans the paths for several requests at once and compares the
+        lengths of the paths with the expected ones.
+
+        :``requests``: A list of ``(start, goal)`` tuples. *Required*.
+        :``expected``: A list of path lengths, with None for unreachable
+                       goals, or the exception that is expected. *Required*.
+        """
+        try:
+            paths = pathfind.plan_paths(self.fgrid, requests)
+        except Exception, e:
+            result = isinstance(expected, type) and isinstance(e, expected)
+            print "Planning %s raised %s: %s" % (requests, e.__class__.__name__, e)
+        else:
+            lengths = [path and len(path) for path in paths]
+            print "Planning %s gave paths of length %s." % (requests, lengths)
+            result = lengths == expected
+
+        if result:
+            self.counter_right += 1
+        else:
+            self.counter_wrong += 1
+
 if __name__ == "__main__":
     if PathfindTest().evaluate():
         print "The pathfinding test was successful."
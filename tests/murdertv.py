@@ -12,14 +12,12 @@ from suspects import person
 
 screen = interface.console.select()
 
-def murderer_flees (game, sid):
-    s   = game.suspect_list.get_murderer()
-    rid = s.alibi.rid
-    game.set_suspect_path(sid, rid)
-
 def init_suspect_positions (game):
     sl    = game.suspect_list
     manor = game.base_manor
+    # Suspects that need a path, planned all at once at the end.
+    leaving = []
+    targets = []
     for sid in xrange(len(sl.suspects)):
         if sid == sl.victim:
             continue
@@ -33,7 +31,9 @@ def init_suspect_positions (game):
                     candidates.append(c)
             if len(candidates) > 0:
                 s.pos = random.choice(candidates)
-                murderer_flees(game, sid)
+                # The murderer is trying to leave as quickly as possible.
+                leaving.append(sid)
+                targets.append(s.alibi.rid)
                 continue
 
         alibi = s.alibi
@@ -51,9 +51,9 @@ def init_suspect_positions (game):
             if manor.get_feature(s.pos).traversable():
                 break
 
-        # The murderer is trying to leave as quickly as possible.
         if sid == sl.murderer:
-            murderer_flees(game, sid)
+            leaving.append(sid)
+            targets.append(s.alibi.rid)
             continue
 
         if s.alibi == None:
@@ -70,6 +70,8 @@ def init_suspect_positions (game):
             # Suspect in their own bedroom -> they won't be leaving for a while.
             s.duration = 100
 
+    game.set_suspect_paths(leaving, targets)
+
 def main ():
     screen.init()
     game = mainloop.Game(type='B')
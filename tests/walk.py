@@ -54,10 +54,10 @@ def main ():
 
     # Initially place the player in the centre of the entrance hall.
     ehall = base_manor.get_room(base_manor.entrance_hall)
-    real_pos = coord.Coord(ehall.pos().x + ehall.size().x/2, ehall.pos().y + ehall.size().y/2)
+    real_pos = coord.MutableCoord(ehall.pos().x + ehall.size().x/2, ehall.pos().y + ehall.size().y/2)
 
     # Initialise a couple of other variables.
-    last_move = coord.Coord(0, 0) # the last step taken by the player
+    last_move = coord.MutableCoord(0, 0) # the last step taken by the player
     move_was_blocked = False   # bumped into a wall
     did_move         = True    # actually took a step
     print_features   = False   # draw manor via the feature grid
@@ -119,7 +119,7 @@ def main ():
         # Otherwise, take a step unless it would make us leave the manor.
 
         # Reinitialise the relevant variables.
-        last_move        = coord.Coord(0, 0)
+        last_move        = coord.MutableCoord(0, 0)
         move_was_blocked = False
         did_move         = True
         tried_move_feat  = NOTHING
@@ -183,7 +183,7 @@ def main ():
 
         if move_was_blocked:
             # Reset last_move.
-            last_move = coord.Coord(0, 0)
+            last_move = coord.MutableCoord(0, 0)
             did_move  = False
 
     screen.deinit()